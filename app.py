@@ -5,14 +5,38 @@ from routes.mapa_calor_colegios import mapa_colegios_bp
 from routes.mapa_calor_empresas import mapa_empresas_bp
 from routes.mapa_calor_estudiantes import mapa_estudiantes_bp
 from routes.mapa_calor_poblacion_parroquias import mapa_poblacion_parroquias_bp
+from routes.api_capas import api_capas_bp
+from routes.teselas import teselas_bp
+from utils import artefactos, cache_paginas, capas_diferidas, datos, perfil, teselas
 
 app = Flask(__name__)
+
+# Datos compartidos: se cargan una sola vez al crear la app
+datos.init_app(app)
+
+# Artefactos precalculados con `flask build-cache` (si corresponden a los datos)
+artefactos.init_app(app)
+
+# Caché de páginas renderizadas (ETag / 304)
+cache_paginas.init_app(app)
+
+# Índices y caché de teselas
+teselas.init_app(app)
+
+# Caché de capas diferidas (/api/layers/...)
+capas_diferidas.init_app(app)
+
+# Server-Timing por etapa y perfil bajo demanda (?_profile=1, solo si se permite)
+perfil.init_app(app)
+
 app.register_blueprint(main_bp)
 app.register_blueprint(mapa_uni_bp)
 app.register_blueprint(mapa_colegios_bp)
 app.register_blueprint(mapa_empresas_bp)
 app.register_blueprint(mapa_poblacion_parroquias_bp)
 app.register_blueprint(mapa_estudiantes_bp)
+app.register_blueprint(teselas_bp)
+app.register_blueprint(api_capas_bp)
 
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=5001)
@@ -0,0 +1,195 @@
+"""Mide cada etapa del pipeline y cada ruta a distintas escalas de datos.
+
+    python benchmarks/ejecutar.py --escalas 1 10 100
+
+Escribe un JSON por escala en benchmarks/resultados/ con el commit actual,
+para comparar entre versiones qué etapa deja de escalar primero.
+"""
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import time
+import warnings
+from contextlib import contextmanager
+
+import numpy as np
+import shapely
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.sinteticos import registro_escalado  # noqa: E402
+
+RESULTADOS_DIR = os.path.join(RAIZ, "benchmarks", "resultados")
+
+# Una ruta por blueprint, más los endpoints de datos
+RUTAS = [
+    "/",
+    "/mapacalor/estudiantes",
+    "/mapacalor/universidades",
+    "/mapacalor/colegios",
+    "/mapacalor/empresas",
+    "/mapacalor/poblacion-parroquias",
+    "/api/estudiantes/conteos",
+    "/api/estudiantes/accesibilidad",
+    "/api/layers/main/estaciones_buses",
+    "/tiles/paradas/12/1154/2048",
+]
+
+
+@contextmanager
+def cronometro(resultados, nombre):
+    inicio = time.perf_counter()
+    yield
+    resultados[nombre] = round(time.perf_counter() - inicio, 4)
+
+
+def commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=RAIZ, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido"
+
+
+def server_timing(cabecera):
+    """{"etapa": segundos} a partir de una cabecera Server-Timing."""
+    etapas = {}
+    for parte in filter(None, (p.strip() for p in (cabecera or "").split(","))):
+        nombre, *params = (x.strip() for x in parte.split(";"))
+        for param in params:
+            if param.startswith("dur="):
+                etapas[nombre] = round(float(param[4:]) / 1000, 4)
+    return etapas
+
+
+def limpiar_caches(app):
+    """Vacía los cachés de respuestas y derivados para medir en frío."""
+    import utils.accesibilidad as accesibilidad
+    import utils.agregados as agregados
+    import utils.geometrias as geometrias
+    import utils.grilla as grilla
+    import utils.hexagonos as hexagonos
+    import utils.piramide as piramide
+
+    app.extensions["cache_paginas"].limpiar()
+    app.extensions["capas_diferidas"].limpiar()
+    app.extensions["teselas"]["cache"].limpiar()
+    app.extensions["teselas"]["indices"].clear()
+    for cache in (
+        grilla._cache_lados, grilla._cache_grillas, grilla._cache_piezas,
+        piramide._cache_coberturas, piramide._cache_niveles,
+        agregados._cache_estudiantes, geometrias._cache_derivadas,
+        hexagonos._cache_hexagonos,
+        accesibilidad._cache_indices, accesibilidad._cache_distancias,
+    ):
+        cache.clear()
+
+
+def medir_etapas(app, registro):
+    """Tiempo de cada etapa del pipeline, aislada del resto."""
+    from utils.accesibilidad import distancias_estudiantes
+    from utils.agregados import tabla_estudiantes
+    from utils.asignacion import contar_por_area
+    from utils.geometrias import CRS_METRICO, derivadas, reproyectar
+    from utils.grilla import obtener_grilla, piezas_alimentadores, piezas_parroquias
+    from utils.quadtree import grilla_adaptativa
+
+    etapas = {}
+    with cronometro(etapas, "reproyectar"):
+        reproyectar(registro.paradas.geometry.values, registro.paradas.crs, CRS_METRICO)
+        for fuente in ("buses", "metro", "parques", "plazas"):
+            derivadas(fuente, getattr(registro, fuente))
+    with cronometro(etapas, "grilla"):
+        grilla = obtener_grilla("parroquias", registro.parroquias)
+        obtener_grilla("alimentadores", registro.alimentadores)
+    with cronometro(etapas, "overlay"):
+        piezas_parroquias(registro.parroquias)
+        piezas_alimentadores(registro.alimentadores)
+    with cronometro(etapas, "asignar_estudiantes"):
+        tabla_estudiantes(registro)
+    with cronometro(etapas, "asignar_grilla"):
+        xy = shapely.get_coordinates(registro.paradas.geometry.values)
+        xy = np.vstack([xy, registro.empresas[["LONGITUD", "LATITUD"]].to_numpy(float)])
+        contar_por_area("grilla_parroquias", grilla.geometry.values, xy[:, 0], xy[:, 1])
+    with cronometro(etapas, "quadtree"):
+        grilla_adaptativa("parroquias", registro.parroquias, xy[:, 0], xy[:, 1])
+    with cronometro(etapas, "accesibilidad"):
+        distancias_estudiantes(registro)
+    return etapas
+
+
+def medir_rutas(app, rutas):
+    """Primera petición (en frío) a cada ruta; usa Server-Timing si existe."""
+    cliente = app.test_client()
+    resultados = {}
+    for ruta in rutas:
+        inicio = time.perf_counter()
+        resp = cliente.get(ruta)
+        resultados[ruta] = {
+            "status": resp.status_code,
+            "segundos": round(time.perf_counter() - inicio, 4),
+            "bytes": len(resp.get_data()),
+            "etapas": server_timing(resp.headers.get("Server-Timing")),
+        }
+    return resultados
+
+
+def ejecutar(escala, rutas):
+    from app import app
+    from utils.datos import RegistroDatos
+
+    resultado = {
+        "commit": commit_actual(),
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "escala": escala,
+        "etapas": {},
+    }
+    with cronometro(resultado["etapas"], "cargar"):
+        registro = RegistroDatos().cargar()
+    with cronometro(resultado["etapas"], "escalar"):
+        registro = registro_escalado(registro, escala)
+    resultado["filas"] = {
+        nombre: len(getattr(registro, nombre))
+        for nombre in ("estudiantes", "colegios", "empresas", "paradas")
+    }
+
+    app.extensions["datos"] = registro
+    limpiar_caches(app)
+    with app.app_context():
+        resultado["etapas"].update(medir_etapas(app, registro))
+    limpiar_caches(app)
+    resultado["rutas"] = medir_rutas(app, rutas)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--escalas", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--rutas", nargs="+", default=RUTAS)
+    parser.add_argument("--salida", default=RESULTADOS_DIR)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    os.makedirs(args.salida, exist_ok=True)
+    for escala in args.escalas:
+        resultado = ejecutar(escala, args.rutas)
+        ruta = os.path.join(args.salida, f"{resultado['commit']}-x{escala}.json")
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+        print(f"escala x{escala}: {resultado['filas']}")
+        for etapa, segundos in resultado["etapas"].items():
+            print(f"  {etapa:22s} {segundos:8.3f}s")
+        for url, medida in resultado["rutas"].items():
+            print(f"  {url:40s} {medida['status']} {medida['segundos']:8.3f}s {medida['bytes']:>10d} B")
+        print(f"  -> {ruta}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Datos sintéticos a escala: multiplica las capas de puntos por un factor.
+
+Cada fila nueva es una copia de una fila real con las coordenadas
+desplazadas (ruido normal de ~200 m) y recortadas al rectángulo de las
+parroquias de Quito, así la distribución espacial se parece a la real.
+"""
+import argparse
+import copy
+import os
+import sys
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils.datos import RegistroDatos  # noqa: E402
+
+# Desvío del ruido en grados (~220 m en Quito)
+RUIDO_GRADOS = 0.002
+
+# Tablas con columnas de coordenadas (lon, lat) que se escalan
+TABLAS = {
+    "estudiantes": ("Longitud", "Latitud"),
+    "colegios": ("LONGITUD", "LATITUD"),
+    "empresas": ("LONGITUD", "LATITUD"),
+}
+
+
+def _coordenadas(lon, lat, limites, rng):
+    minx, miny, maxx, maxy = limites
+    lon = np.clip(lon + rng.normal(0, RUIDO_GRADOS, len(lon)), minx, maxx)
+    lat = np.clip(lat + rng.normal(0, RUIDO_GRADOS, len(lat)), miny, maxy)
+    return lon, lat
+
+
+def escalar_tabla(df, col_lon, col_lat, factor, limites, rng):
+    """`df` con `factor` veces sus filas (las originales se conservan)."""
+    if factor <= 1:
+        return df
+    extra = rng.integers(0, len(df), len(df) * (factor - 1))
+    nuevas = df.iloc[extra].reset_index(drop=True)
+    lon, lat = _coordenadas(
+        nuevas[col_lon].to_numpy(float), nuevas[col_lat].to_numpy(float), limites, rng
+    )
+    nuevas[col_lon] = lon
+    nuevas[col_lat] = lat
+    return pd.concat([df, nuevas], ignore_index=True)
+
+
+def escalar_puntos(gdf, factor, limites, rng):
+    """GeoDataFrame de puntos con `factor` veces sus filas."""
+    if factor <= 1:
+        return gdf
+    extra = rng.integers(0, len(gdf), len(gdf) * (factor - 1))
+    nuevas = gdf.iloc[extra].reset_index(drop=True)
+    lon, lat = _coordenadas(nuevas.geometry.x.to_numpy(), nuevas.geometry.y.to_numpy(), limites, rng)
+    nuevas[gdf.geometry.name] = gpd.points_from_xy(lon, lat, crs=gdf.crs)
+    return pd.concat([gdf, nuevas], ignore_index=True)
+
+
+def registro_escalado(base, factor, semilla=0):
+    """Copia del registro `base` con estudiantes, colegios, empresas y paradas
+    multiplicados por `factor`. La versión de datos cambia con la escala."""
+    rng = np.random.default_rng(semilla)
+    limites = base.parroquias.total_bounds
+    registro = copy.copy(base)
+    for nombre, (col_lon, col_lat) in TABLAS.items():
+        setattr(
+            registro,
+            nombre,
+            escalar_tabla(getattr(base, nombre), col_lon, col_lat, factor, limites, rng),
+        )
+    registro.paradas = escalar_puntos(base.paradas, factor, limites, rng)
+    registro.version = f"{base.version}-x{factor}"
+    return registro
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("factor", type=int)
+    parser.add_argument("destino", help="CSV de estudiantes escalado a escribir")
+    args = parser.parse_args()
+
+    registro = registro_escalado(RegistroDatos().cargar(), args.factor)
+    registro.estudiantes.rename(columns={"periodo": "Semestre"}).to_csv(
+        args.destino, sep=";", index=False
+    )
+    print(f"{len(registro.estudiantes)} estudiantes -> {args.destino}")
+
+
+if __name__ == "__main__":
+    main()
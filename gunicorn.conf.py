@@ -0,0 +1,39 @@
+# Configuración de gunicorn para producción: `gunicorn -c gunicorn.conf.py app:app`
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5001')}"
+
+# La app (y el registro de datos) se carga una vez en el maestro antes del
+# fork; los workers comparten esa memoria por copy-on-write.
+preload_app = True
+
+# El trabajo pesado es CPU (geopandas / render) y se hace una vez; las
+# peticiones normales salen del caché, así que bastan hilos por worker.
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# Los hilos no escalan con los núcleos: por el GIL cada worker usa a lo sumo
+# uno, y los procesos ya cubren todos. Los hilos solo solapan esperas (enviar
+# respuestas a clientes lentos, 304 del caché), así que el valor es fijo.
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+
+# Un render en frío de una página grande puede tardar varios segundos
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+keepalive = 5
+
+accesslog = "-"
+
+
+def when_ready(server):
+    """Precalienta en el maestro y congela el heap antes de crear workers."""
+    from app import app
+    from utils.precalentar import precalentar
+
+    if os.environ.get("PRECALENTAR", "1") != "0":
+        precalentar(app, log=server.log.info)
+
+    # Lo creado hasta aquí no lo vuelve a recorrer el GC: evita que los
+    # workers toquen (y copien) esas páginas de memoria.
+    gc.collect()
+    gc.freeze()
@@ -0,0 +1,64 @@
+# =========================================================
+# 1. IMPORTACIONES Y CONFIGURACIÓN BÁSICA
+# =========================================================
+import json
+
+from flask import Blueprint, abort, current_app, request
+from utils.cache_paginas import obtener_o_construir, respuesta_cacheada
+from utils.capas_diferidas import CAPAS, PAGINAS, geojson_capa
+from utils.carreras import indice_carreras
+from utils.datos import obtener_datos
+
+api_capas_bp = Blueprint("api_capas", __name__)
+
+
+# =========================================================
+# 2. CAPAS DIFERIDAS (se piden al activarlas en el control)
+# =========================================================
+@api_capas_bp.route("/api/layers/<pagina>/<capa>")
+def capa(pagina, capa):
+    if capa not in PAGINAS.get(pagina, ()):
+        abort(404)
+
+    datos = obtener_datos()
+    periodo = None
+    if CAPAS[capa].por_periodo:
+        periodo = datos.periodo_valido(request.args.get("periodo"))
+
+    cache = current_app.extensions["capas_diferidas"]
+    clave = (capa, periodo, datos.version)
+    entrada = obtener_o_construir(cache, clave, lambda: geojson_capa(capa, periodo))
+
+    return respuesta_cacheada(
+        entrada, "application/json", current_app.config["CACHE_CAPAS_CONTROL"]
+    )
+
+
+# =========================================================
+# 3. CAMPUS QUE OFRECEN LAS CARRERAS MARCADAS
+# =========================================================
+@api_capas_bp.route("/api/carreras/campus")
+def campus_carreras():
+    """Ids de campus (posición en universidades) con alguna de las `carrera`."""
+    datos = obtener_datos()
+    periodo = datos.periodo_valido(request.args.get("periodo"))
+    carreras = tuple(sorted(set(request.args.getlist("carrera"))))
+    # Como en densidad.png: sin carreras inventadas que llenen el caché
+    indice = indice_carreras(datos, periodo)
+    if not all(indice.ofrece(c) for c in carreras):
+        abort(404)
+
+    cache = current_app.extensions["capas_diferidas"]
+    clave = ("campus_carreras", periodo, carreras, datos.version)
+    entrada = obtener_o_construir(
+        cache,
+        clave,
+        lambda: json.dumps(
+            {"campus": indice.campus(carreras).tolist()},
+            separators=(",", ":"),
+        ),
+    )
+
+    return respuesta_cacheada(
+        entrada, "application/json", current_app.config["CACHE_CAPAS_CONTROL"]
+    )
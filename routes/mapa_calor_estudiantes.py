@@ -1,418 +1,454 @@
-from flask import Blueprint, render_template, request
+from flask import Blueprint, abort, current_app, render_template, request, url_for
 import geopandas as gpd
 import pandas as pd
 import folium
 import datetime
-from shapely.geometry import Point
+import json
 from folium.plugins.treelayercontrol import TreeLayerControl
 import itertools
-import os
 from matplotlib.colors import to_rgb, to_hex
+from branca.colormap import LinearColormap
+from utils.cache_paginas import obtener_o_construir, pagina_cacheada, respuesta_cacheada
+from utils.capas import (
+    CapaDiferida,
+    CapaImagen,
+    CapaTeselas,
+    capa_geojson,
+    capa_topojson,
+    icono_fa,
+)
+from utils.capas_diferidas import registrar_capa, url_capa
+from utils.carreras import indice_carreras
+from utils.clusters import url_clusters
+from utils.accesibilidad import UMBRALES_M, accesibilidad_por_parroquia
+from utils.agregados import estudiantes_por_parroquia
+from utils.datos import obtener_datos
+from utils.densidad import imagen_densidad
+from utils.geometrias import derivadas
+from utils.piramide import ZOOM_PAGINAS, por_zoom
+from utils.perfil import etapa
 from utils.helpers import darken_color
 
 mapa_estudiantes_bp = Blueprint("mapa_calor_estudiantes", __name__)
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, "..", "data")
 
-# Rutas
-EXCEL_PATH = os.path.join(DATA_DIR, "universidades_colegios.xlsx")
-SHEET_UNI = "Universidades"
-SHEET_COL = "Colegios"
-CSV_EST = os.path.join(DATA_DIR, "ubicacionEstudiantesPeriodo.csv")
-GJSON_RURAL = os.path.join(DATA_DIR, "parroquiasRurales.geojson")
-GJSON_URB = os.path.join(DATA_DIR, "parroquiasUrbanas.geojson")
-CARRERAS_PATH = os.path.join(DATA_DIR, "baseCarreras.xlsx")
+def colores_por_terciles(valores, bins, gradientes):
+    """Color de relleno de cada valor según su tercil y el gradiente del tercil.
 
-@mapa_estudiantes_bp.route("/mapacalor/estudiantes")
-def mapa():
-    # 1. ---------------- Periodo seleccionado -----------------
-    selected_periodo = request.args.get("periodo")
-
-    # 2. ---------------- Datos de estudiantes -----------------
-    df_all = pd.read_csv(CSV_EST, sep=";").rename(columns={"Semestre": "periodo"})
-    df_all["periodo"] = df_all["periodo"].astype(str)
-    df_all["Latitud"] = pd.to_numeric(df_all["Latitud"], errors="coerce")
-    df_all["Longitud"] = pd.to_numeric(df_all["Longitud"], errors="coerce")
-    df_all.dropna(subset=["Latitud", "Longitud"], inplace=True)
-
-    periodos = sorted(df_all["periodo"].unique())
-    if selected_periodo not in periodos:
-        selected_periodo = periodos[0]
-    df_est = df_all[df_all["periodo"] == selected_periodo]
-
-    # 3. ---------------- Parroquias y conteo ------------------
-    gdf_rurales = gpd.read_file(GJSON_RURAL)
-    gdf_urbanas = gpd.read_file(GJSON_URB)
-    gdf_rurales["tipo"] = "rural"
-    gdf_urbanas["tipo"] = "urbana"
-    gdf_rurales = gdf_rurales.rename(columns={"DPA_DESPAR": "nombre"})
-    gdf_urbanas = gdf_urbanas.rename(columns={"dpa_despar": "nombre"})
-    gdf_parroquias = pd.concat(
-        [
-            gdf_rurales[["nombre", "geometry", "tipo"]],
-            gdf_urbanas[["nombre", "geometry", "tipo"]],
-        ],
-        ignore_index=True,
-    ).set_crs("EPSG:4326")
-
-    # 3B. ---------------- Población por parroquia ------------------
-    df_pob = pd.read_excel(os.path.join(DATA_DIR, "poblacionParroquias.xlsx"))
-    df_pob["Poblacion"] = (
-        df_pob["Poblacion"].astype(str).str.replace(",", "").astype(float)
+    Un valor en el borde entre dos terciles toma el color del tercil superior.
+    """
+    colores = pd.Series(None, index=valores.index, dtype=object)
+    for i in range(3):
+        lwr, upr = bins[i], bins[i + 1]
+        en_tercil = valores.between(lwr, upr)
+        if not en_tercil.any():
+            continue
+        scale = LinearColormap(gradientes[i], vmin=lwr, vmax=upr)
+        colores[en_tercil] = valores[en_tercil].map(scale)
+    return colores
+
+# Gradiente de cada tercil en el coloreo por estudiantes (se aplica en el cliente)
+GRADIENTES_ESTUDIANTES = [
+    ["#deebf7", "#9ecae1", "#3182bd"],
+    ["#e5f5e0", "#a1d99b", "#31a354"],
+    ["#fff7bc", "#fec44f", "#d95f0e"],
+]
+
+# Acceso al transporte: verde (cerca) → rojo (lejos); satura en esta distancia
+GRADIENTE_ACCESO = ["#1a9850", "#fee08b", "#d73027"]
+DISTANCIA_SATURACION_M = 1500
+
+
+def parroquias_simplificadas(datos):
+    """Parroquias con el nivel de la pirámide que corresponde al zoom inicial."""
+    return por_zoom("parroquias", datos.parroquias, ZOOM_PAGINAS).copy()
+
+
+def terciles(valores):
+    """Bordes [min, 1/3, 2/3, max] redondeados, como los usa el coloreo."""
+    return valores.quantile([0, 1 / 3, 2 / 3, 1]).round(0).astype(int).tolist()
+
+
+def tooltip_parroquia(nombres, valores, etiqueta):
+    """Texto del tooltip: nombre de la parroquia y el valor con su etiqueta."""
+    return "<b>Parroquia:</b> " + nombres + f"<br><b>{etiqueta}:</b> " + valores.astype(str)
+
+
+# ---------------- Capas diferidas (coloreo de parroquias) -----------------
+def _capa_coloreo_estudiantes(datos, periodo):
+    """Solo geometría e id: el color por periodo lo pone el cliente."""
+    gdf_parroquias = parroquias_simplificadas(datos)
+    return gpd.GeoDataFrame(
+        {"id": range(len(gdf_parroquias)), "nombre": gdf_parroquias["nombre"].values},
+        geometry=gdf_parroquias.geometry.values,
+        crs=gdf_parroquias.crs,
     )
 
-    df_pob["Parroquia"] = df_pob["Parroquia"].str.strip().str.upper()
-    gdf_parroquias["nombre_upper"] = gdf_parroquias["nombre"].str.strip().str.upper()
+
+def _capa_coloreo_poblacion(datos, periodo):
+    gdf_parroquias = parroquias_simplificadas(datos)
+
+    # Población por parroquia
+    df_pob = datos.poblacion
+    gdf_parroquias["nombre_upper"] = gdf_parroquias["nombre"].str.upper()
 
     gdf_parroquias = gdf_parroquias.merge(
         df_pob, left_on="nombre_upper", right_on="Parroquia", how="left"
     )
     gdf_parroquias["Poblacion"] = gdf_parroquias["Poblacion"].fillna(0)
 
-    gdf_est = gpd.GeoDataFrame(
-        df_est,
-        geometry=[Point(xy) for xy in zip(df_est["Longitud"], df_est["Latitud"])],
-        crs="EPSG:4326",
-    )
-    gdf_join = gpd.sjoin(gdf_est, gdf_parroquias, how="inner", predicate="within")
-    conteo = gdf_join.groupby("nombre").size().reset_index(name="n_estudiantes")
-    gdf_parroquias = gdf_parroquias.merge(conteo, on="nombre", how="left")
-    gdf_parroquias["n_estudiantes"] = gdf_parroquias["n_estudiantes"].fillna(0)
-    gdf_parroquias["geometry"] = gdf_parroquias["geometry"].simplify(
-        0.0005, preserve_topology=True
+    bins_pob = terciles(gdf_parroquias["Poblacion"])
+
+    gradientes_pob = [
+        ["#f2f0f7", "#cbc9e2", "#9e9ac8"],
+        ["#e7f0fa", "#c6dbef", "#6baed6"],
+        ["#fee5d9", "#fcae91", "#fb6a4a"],
+    ]
+
+    poblacion = gdf_parroquias["Poblacion"].astype(int)
+    return gpd.GeoDataFrame(
+        {
+            "color": colores_por_terciles(gdf_parroquias["Poblacion"], bins_pob, gradientes_pob),
+            "tooltip": tooltip_parroquia(gdf_parroquias["nombre"], poblacion, "Población"),
+        },
+        geometry=gdf_parroquias.geometry,
     )
 
-    # 4. ---------------- Mapa base ----------------------------
-    m = folium.Map(location=[-0.20, -78.50], zoom_start=11, tiles="cartodbpositron")
 
-    # 5. ---------------- Límites de parroquias -----------------
-    fg_parroquias = folium.FeatureGroup(name="Límites de Parroquias").add_to(m)
+registrar_capa("coloreo_estudiantes", _capa_coloreo_estudiantes, ["estudiantes"])
+registrar_capa("coloreo_poblacion", _capa_coloreo_poblacion, ["estudiantes"])
 
-    for _, row in gdf_parroquias.iterrows():
-        folium.GeoJson(
-            {
-                "type": "Feature",
-                "geometry": row.geometry.__geo_interface__,
-                "properties": {"nombre": row["nombre"]},
-            },
-            style_function=lambda _: {
-                "fillColor": "white",
-                "color": "black",
-                "weight": 1,
-                "fillOpacity": 0.01,  # casi invisible pero capta eventos
-            },
-            tooltip=folium.GeoJsonTooltip(fields=["nombre"], aliases=["Parroquia:"]),
-        ).add_to(fg_parroquias)
 
-    # 5B. ---------------- Parroquias (Coloreo por cantidad de estudiantes) -----------------
-    fg_coloreo = folium.FeatureGroup(
-        name="Parroquias – Estudiantes", show=False
-    ).add_to(m)
+def conteos_json(datos):
+    """Estudiantes por parroquia de todos los periodos en un solo JSON.
 
-    # Cuantiles para definir los tres grupos
-    bins = (
-        gdf_parroquias["n_estudiantes"]
-        .quantile([0, 1 / 3, 2 / 3, 1])
-        .round(0)
-        .astype(int)
-        .tolist()
+    `conteos[periodo]` es un arreglo indexado por el id de parroquia (su
+    posición en `datos.parroquias`) y `bins[periodo]` los bordes de terciles.
+    """
+    conteos, bins = {}, {}
+    for periodo in datos.periodos:
+        conteo = estudiantes_por_parroquia(datos, periodo)
+        conteos[periodo] = conteo.tolist()
+        bins[periodo] = terciles(conteo)
+    return json.dumps(
+        {
+            "periodos": list(datos.periodos),
+            "parroquias": datos.parroquias["nombre"].tolist(),
+            "conteos": conteos,
+            "bins": bins,
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
     )
 
-    gradientes = [
-        ["#deebf7", "#9ecae1", "#3182bd"],
-        ["#e5f5e0", "#a1d99b", "#31a354"],
-        ["#fff7bc", "#fec44f", "#d95f0e"],
-    ]
 
-    from branca.colormap import LinearColormap
+def accesibilidad_json(datos):
+    """Acceso al transporte por parroquia de todos los periodos en un JSON.
+
+    Por periodo, arreglos indexados por id de parroquia (como en
+    `conteos_json`): estudiantes, mediana de distancia a la parada más
+    cercana (m) y % a ≤ cada umbral; null donde no hay estudiantes.
+    """
+    periodos = {}
+    for periodo in datos.periodos:
+        tabla = accesibilidad_por_parroquia(datos, periodo).round(0)
+        tabla = tabla.astype(object).where(tabla.notna(), None)
+        periodos[periodo] = {col: tabla[col].tolist() for col in tabla.columns}
+    return json.dumps(
+        {"umbrales": list(UMBRALES_M), "periodos": periodos},
+        separators=(",", ":"),
+    )
 
-    for i in range(3):
-        lwr, upr = bins[i], bins[i + 1]
-        sub = gdf_parroquias.query("n_estudiantes >= @lwr and n_estudiantes <= @upr")
-        if sub.empty:
-            continue
-        scale = LinearColormap(gradientes[i], vmin=lwr, vmax=upr)
 
-        for _, row in sub.iterrows():
-            folium.GeoJson(
-                {
-                    "type": "Feature",
-                    "geometry": row.geometry.__geo_interface__,
-                    "properties": {
-                        "nombre": row["nombre"],
-                        "n_estudiantes": int(row["n_estudiantes"]),
-                    },
-                },
-                style_function=lambda _, r=row, s=scale: {
-                    "fillColor": s(r["n_estudiantes"]),
-                    "color": "gray",
-                    "weight": 0.5,
-                    "fillOpacity": 0.65,
-                },
-                tooltip=folium.GeoJsonTooltip(
-                    fields=["nombre", "n_estudiantes"],
-                    aliases=["Parroquia:", "Estudiantes:"],
-                ),
-            ).add_to(fg_coloreo)
+@mapa_estudiantes_bp.route("/api/estudiantes/accesibilidad")
+def accesibilidad():
+    datos = obtener_datos()
+    cache = current_app.extensions["capas_diferidas"]
+    clave = ("accesibilidad_estudiantes", datos.version)
+    entrada = obtener_o_construir(cache, clave, lambda: accesibilidad_json(datos))
+
+    return respuesta_cacheada(
+        entrada, "application/json", current_app.config["CACHE_CAPAS_CONTROL"]
+    )
 
-    # 5C. ---------------- Parroquias (Coloreo por población) -----------------
-    fg_poblacion = folium.FeatureGroup(
-        name="Parroquias – Población", show=False
-    ).add_to(m)
 
-    bins_pob = (
-        gdf_parroquias["Poblacion"]
-        .quantile([0, 1 / 3, 2 / 3, 1])
-        .round(0)
-        .astype(int)
-        .tolist()
+@mapa_estudiantes_bp.route("/api/estudiantes/conteos")
+def conteos():
+    datos = obtener_datos()
+    cache = current_app.extensions["capas_diferidas"]
+    clave = ("conteos_estudiantes", datos.version)
+    entrada = obtener_o_construir(cache, clave, lambda: conteos_json(datos))
+
+    return respuesta_cacheada(
+        entrada, "application/json", current_app.config["CACHE_CAPAS_CONTROL"]
     )
 
-    gradientes_pob = [
-        ["#f2f0f7", "#cbc9e2", "#9e9ac8"],
-        ["#e7f0fa", "#c6dbef", "#6baed6"],
-        ["#fee5d9", "#fcae91", "#fb6a4a"],
-    ]
 
-    from branca.colormap import LinearColormap
+def limites_densidad(datos):
+    """Extensión del raster de densidad: la de las parroquias (oeste, sur, este, norte)."""
+    return tuple(datos.parroquias.total_bounds)
 
-    for i in range(3):
-        lwr, upr = bins_pob[i], bins_pob[i + 1]
-        sub = gdf_parroquias.query("Poblacion >= @lwr and Poblacion <= @upr")
-        if sub.empty:
-            continue
-        scale = LinearColormap(gradientes_pob[i], vmin=lwr, vmax=upr)
-
-        for _, row in sub.iterrows():
-            folium.GeoJson(
-                {
-                    "type": "Feature",
-                    "geometry": row.geometry.__geo_interface__,
-                    "properties": {
-                        "nombre": row["nombre"],
-                        "poblacion": int(row["Poblacion"]),
-                    },
-                },
-                style_function=lambda _, r=row, s=scale: {
-                    "fillColor": s(r["Poblacion"]),
-                    "color": "black",
-                    "weight": 0.5,
-                    "fillOpacity": 0.6,
-                },
-                tooltip=folium.GeoJsonTooltip(
-                    fields=["nombre", "poblacion"],
-                    aliases=["Parroquia:", "Población:"],
-                ),
-            ).add_to(fg_poblacion)
 
-    # 6. ---------------- Universidades ------------------------
-    df_uni = pd.read_excel(EXCEL_PATH, sheet_name=SHEET_UNI).rename(
-        columns=lambda c: c.strip()
+def png_densidad(datos, periodo, carreras=()):
+    """Densidad de residencias de estudiantes del periodo (y carreras) en PNG."""
+    df = datos.estudiantes
+    filtro = df["periodo"] == periodo
+    if carreras:
+        filtro &= df["Carrera"].isin(carreras)
+    return imagen_densidad(
+        df.loc[filtro, "Longitud"].to_numpy(),
+        df.loc[filtro, "Latitud"].to_numpy(),
+        limites_densidad(datos),
     )
-    df_uni["UNIVERSIDAD"] = df_uni["UNIVERSIDAD"].str.strip()
 
-    # Carrera ↔ universidad (filtrado por periodo seleccionado)
-    df_carr = pd.read_excel(CARRERAS_PATH)
-    df_carr["PERIODO"] = df_carr["PERIODO"].astype(str)
 
-    if selected_periodo in ["202410", "202420"]:
-        df_carr = df_carr[df_carr["PERIODO"].isin([selected_periodo, "202400"])]
-    else:
-        df_carr = df_carr[df_carr["PERIODO"].isin([selected_periodo, "202520"])]
+@mapa_estudiantes_bp.route("/api/estudiantes/densidad.png")
+def densidad():
+    datos = obtener_datos()
+    periodo = datos.periodo_valido(request.args.get("periodo"))
+    carreras = tuple(sorted(set(request.args.getlist("carrera"))))
+    # Cada combinación cuesta un KDE y una entrada del caché: solo carreras ofertadas
+    indice = indice_carreras(datos, periodo)
+    if not all(indice.ofrece(c) for c in carreras):
+        abort(404)
+
+    cache = current_app.extensions["capas_diferidas"]
+    clave = ("densidad_estudiantes", periodo, carreras, datos.version)
+    entrada = obtener_o_construir(
+        cache, clave, lambda: png_densidad(datos, periodo, carreras), comprimible=False
+    )
 
-    uni_to_carr = df_carr.groupby("UNIVERSIDAD")["CARRERA"].apply(list).to_dict()
+    return respuesta_cacheada(
+        entrada, "image/png", current_app.config["CACHE_CAPAS_CONTROL"]
+    )
 
-    grupo_uni_fin = {"PUBLICA": [], "PRIVADA": []}
-    for tipo in ["PUBLICA", "PRIVADA"]:
-        fg = folium.FeatureGroup(name=f"Universidades {tipo.title()}").add_to(m)
-        grupo_uni_fin[tipo] = fg
-        for _, row in df_uni[df_uni["FINANCIAMIENTO"].str.upper() == tipo].iterrows():
-            uni = row["UNIVERSIDAD"]
-            folium.Marker(
-                location=[row["LATITUD"], row["LONGITUD"]],
-                title=uni,
-                tooltip=f"{uni} – {row['CAMPUS']}",
-                icon=folium.Icon(
-                    color=(
-                        "red"
-                        if uni.upper() == "UNIVERSIDAD DE LAS AMERICAS"
-                        else "blue"
-                    ),
-                    icon="university",
-                    prefix="fa",
-                ),
-                careers=uni_to_carr.get(uni, []),
-            ).add_to(fg)
 
-    # 7. ---------------- Colegios por tipo --------------------
-    df_col = pd.read_excel(EXCEL_PATH, sheet_name=SHEET_COL).rename(
-        columns=lambda c: c.strip()
-    )
-    df_col["LATITUD"] = pd.to_numeric(df_col["LATITUD"], errors="coerce")
-    df_col["LONGITUD"] = pd.to_numeric(df_col["LONGITUD"], errors="coerce")
-    df_col.dropna(subset=["LATITUD", "LONGITUD"], inplace=True)
-
-    colegios_grupos, color_cycle = [], itertools.cycle(["orange", "cadetblue"])
-    for tipo in sorted(df_col["TIPO"].unique()):
-        nombre = f"Colegios {tipo}"
-        fg = folium.FeatureGroup(name=nombre).add_to(m)
-        colegios_grupos.append({"label": nombre, "layer": fg})
-        color = next(color_cycle)
-        for _, row in df_col[df_col["TIPO"] == tipo].iterrows():
-            folium.Marker(
-                location=[row["LATITUD"], row["LONGITUD"]],
-                tooltip=row["COLEGIO"].strip(),
-                icon=folium.Icon(color=color, icon="graduation-cap", prefix="fa"),
-            ).add_to(fg)
+@mapa_estudiantes_bp.route("/mapacalor/estudiantes")
+@pagina_cacheada
+def mapa():
+    datos = obtener_datos()
 
-    # ---------------- Parques ----------------
-    gdf_parques = gpd.read_file("data/parques.geojson").to_crs("EPSG:4326")
-    gdf_parques["PRK"] = gdf_parques["PRK"].fillna("Sin nombre")
-
-    colores_parques = {
-        "Barrial": "#66c2a5",
-        "Sectorial": "#fc8d62",
-        "Zonal": "#8da0cb",
-        "Metropolitano": "#6a0dad",
-        "Menor a 300 m2": "red",
-    }
-    grupos_parques = {}  # para el overlay tree
-
-    for categoria, subgdf in gdf_parques.groupby("d_COA"):
-        fg = folium.FeatureGroup(name=f"Parques {categoria}").add_to(m)
-        grupos_parques[categoria] = fg
-        color = colores_parques.get(categoria, "gray")
-        for _, row in subgdf.iterrows():
-            fill_col = colores_parques.get(categoria, "gray")
-            border_col = darken_color(fill_col, factor=0.6)  # oscurecer el borde
+    # 1. ---------------- Periodo seleccionado -----------------
+    periodos = datos.periodos
+    selected_periodo = datos.periodo_valido(request.args.get("periodo"))
 
-            folium.GeoJson(
-                {
-                    "type": "Feature",
-                    "geometry": row.geometry.__geo_interface__,
-                    "properties": row.drop(labels="geometry").to_dict(),
-                },
-                style_function=lambda _, fc=fill_col, bc=border_col: {
-                    "fillColor": fc,
-                    "color": bc,
-                    "weight": 1,
-                    "fillOpacity": 0.4,
-                },
-                tooltip=folium.GeoJsonTooltip(fields=["PRK"], aliases=["Parque:"]),
-            ).add_to(fg)
+    # 2-3. ---------------- Parroquias (los límites no dependen del conteo) ----
+    gdf_parroquias = parroquias_simplificadas(datos)
+
+    # 4. ---------------- Mapa base ----------------------------
+    m = folium.Map(location=[-0.20, -78.50], zoom_start=11, tiles="cartodbpositron")
 
-    # --- Marcadores de punto en el centro de cada parque ---
-    for _, row in gdf_parques.iterrows():
-        centroide = row.geometry.centroid
-        folium.Marker(
-            location=[centroide.y, centroide.x],
-            icon=folium.Icon(color="green", icon="tree", prefix="fa"),
-            tooltip=row["PRK"],
-        ).add_to(grupos_parques.get(row["d_COA"], m))
-
-    # ---------------- Centros Comerciales (GeoJSON) ----------------
-    gdf_cc = gpd.read_file(
-        "data/centros_comerciales.geojson"
-    )  # ajusta ruta si es necesario
-    gdf_cc = gdf_cc.to_crs("EPSG:4326")
-
-    cc_fg = folium.FeatureGroup(name="Centros Comerciales").add_to(m)
-
-    folium.GeoJson(
-        gdf_cc,
-        name="Centros Comerciales",
-        style_function=lambda feature: {
-            "fillColor": "#222222",  # negro
-            "color": "#000000",  # borde negro
+    # 5. ---------------- Límites de parroquias -----------------
+    fg_parroquias = folium.FeatureGroup(name="Límites de Parroquias").add_to(m)
+
+    capa_topojson(
+        gdf_parroquias,
+        {
+            "fillColor": "white",
+            "color": "black",
             "weight": 1,
-            "fillOpacity": 0.5,  # translúcido
+            "fillOpacity": 0.01,  # casi invisible pero capta eventos
         },
-        tooltip=folium.GeoJsonTooltip(fields=["name"], aliases=["Centro Comercial:"]),
-    ).add_to(cc_fg)
-
-    # --- Marcadores de punto en el centro de cada centro comercial ---
-    for _, row in gdf_cc.iterrows():
-        centroide = row.geometry.centroid
-        folium.Marker(
-            location=[centroide.y, centroide.x],
-            icon=folium.Icon(color="black", icon="shopping-bag", prefix="fa"),
-            tooltip=row["name"],
-        ).add_to(cc_fg)
+        campos=["nombre"],
+        aliases=["Parroquia:"],
+    ).add_to(fg_parroquias)
 
-    # ---------------- Plazas ----------------
-    gdf_plazas = gpd.read_file("data/plazas.geojson").to_crs("EPSG:4326")
-    gdf_plazas["NAM"] = gdf_plazas["NAM"].fillna("Sin nombre")
-    gdf_plazas["d_KCA"] = gdf_plazas["d_KCA"].fillna("Desconocido")
+    # 5B. ---------------- Parroquias (Coloreo por cantidad de estudiantes) -----------------
+    # Se piden a /api/layers/... la primera vez que se marcan en el control;
+    # el color del periodo elegido lo aplica la plantilla con los conteos
+    fg_coloreo = folium.FeatureGroup(
+        name="Parroquias – Estudiantes", show=False
+    ).add_to(m)
+    CapaDiferida(
+        url_capa("estudiantes", "coloreo_estudiantes"),
+        {"color": "gray", "weight": 0.5, "fillOpacity": 0.65},
+    ).add_to(fg_coloreo)
 
-    colores_plazas = {
-        "Plazoleta": "#00ffff",  # cyan puro
-        "Plaza": "#ff00ff",  # fucsia/neón
-        "Bulevard": "#ffff00",  # amarillo brillante
-        "Mirador": "#00ff00",  # verde fosforescente
-    }
+    # 5C. ---------------- Parroquias (Coloreo por población) -----------------
+    fg_poblacion = folium.FeatureGroup(
+        name="Parroquias – Población", show=False
+    ).add_to(m)
+    CapaDiferida(
+        url_capa("estudiantes", "coloreo_poblacion"),
+        {"color": "black", "weight": 0.5, "fillOpacity": 0.6},
+        estilo_campos={"fillColor": "color"},
+    ).add_to(fg_poblacion)
+
+    # 5C-bis. ------------- Parroquias (Acceso al transporte público) -----------
+    # Misma geometría que el coloreo de estudiantes; la plantilla la colorea
+    # con la mediana de distancia a la parada más cercana del periodo
+    fg_acceso = folium.FeatureGroup(
+        name="Parroquias – Acceso a Transporte", show=False
+    ).add_to(m)
+    CapaDiferida(
+        url_capa("estudiantes", "coloreo_estudiantes"),
+        {"color": "gray", "weight": 0.5, "fillOpacity": 0.65},
+    ).add_to(fg_acceso)
+
+    # 5D. ---------------- Densidad de residencias (raster KDE) -----------------
+    # Una sola imagen para todos los estudiantes del periodo; la plantilla
+    # cambia su URL al elegir otro periodo o filtrar carreras
+    fg_densidad = folium.FeatureGroup(
+        name="Densidad de Estudiantes", show=False
+    ).add_to(m)
+    oeste, sur, este, norte = limites_densidad(datos)
+    capa_densidad = CapaImagen(
+        url_for("mapa_calor_estudiantes.densidad", periodo=selected_periodo, v=datos.version),
+        [[sur, oeste], [norte, este]],
+        opacidad=0.8,
+    ).add_to(fg_densidad)
 
-    grupos_plazas = {}
+    # 6. ---------------- Universidades ------------------------
+    df_uni = datos.universidades
+
+    # Oferta de carreras del periodo (para el filtro lateral)
+    df_carr = datos.carreras_periodo(selected_periodo)
+
+    with etapa("marcadores"):
+        grupo_uni_fin = {"PUBLICA": [], "PRIVADA": []}
+        for tipo in ["PUBLICA", "PRIVADA"]:
+            fg = folium.FeatureGroup(name=f"Universidades {tipo.title()}").add_to(m)
+            grupo_uni_fin[tipo] = fg
+            # El filtro de carreras pide al servidor los ids de campus
+            for campus_id, row in df_uni[df_uni["FINANCIAMIENTO"].str.upper() == tipo].iterrows():
+                uni = row["UNIVERSIDAD"]
+                folium.Marker(
+                    location=[row["LATITUD"], row["LONGITUD"]],
+                    title=uni,
+                    tooltip=f"{uni} – {row['CAMPUS']}",
+                    icon=folium.Icon(
+                        color=(
+                            "red"
+                            if uni.upper() == "UNIVERSIDAD DE LAS AMERICAS"
+                            else "blue"
+                        ),
+                        icon="university",
+                        prefix="fa",
+                    ),
+                    campus_id=int(campus_id),
+                ).add_to(fg)
+
+        # 7. ---------------- Colegios por tipo --------------------
+        df_col = datos.colegios
+
+        colegios_grupos, color_cycle = [], itertools.cycle(["orange", "cadetblue"])
+        for tipo in sorted(df_col["TIPO"].unique()):
+            nombre = f"Colegios {tipo}"
+            fg = folium.FeatureGroup(name=nombre).add_to(m)
+            colegios_grupos.append({"label": nombre, "layer": fg})
+            # Agrupados en el servidor por zoom; se piden por tesela
+            CapaTeselas(
+                url_clusters("colegios", tipo),
+                {},
+                icono=icono_fa("graduation-cap", next(color_cycle)),
+            ).add_to(fg)
 
-    for categoria, subgdf in gdf_plazas.groupby("d_KCA"):
-        fg = folium.FeatureGroup(name=f"Plazas {categoria}").add_to(m)
-        grupos_plazas[categoria] = fg
-        color = colores_plazas.get(categoria, "gray")
+    # ---------------- Parques ----------------
+    with etapa("equipamientos"):
+        gdf_parques = datos.parques
+
+        colores_parques = {
+            "Barrial": "#66c2a5",
+            "Sectorial": "#fc8d62",
+            "Zonal": "#8da0cb",
+            "Metropolitano": "#6a0dad",
+            "Menor a 300 m2": "red",
+        }
+        grupos_parques = {}  # para el overlay tree
+
+        for categoria, subgdf in gdf_parques.groupby("d_COA"):
+            fg = folium.FeatureGroup(name=f"Parques {categoria}").add_to(m)
+            grupos_parques[categoria] = fg
+            fill_col = colores_parques.get(categoria, "gray")
+            border_col = darken_color(fill_col, factor=0.6)  # oscurecer el borde
 
-        for _, row in subgdf.iterrows():
-            fill_col = color
-            border_col = darken_color(fill_col, factor=0.6)
-            folium.GeoJson(
-                {
-                    "type": "Feature",
-                    "geometry": row.geometry.__geo_interface__,
-                    "properties": row.drop(labels="geometry").to_dict(),
-                },
-                style_function=lambda _, fc=fill_col, bc=border_col: {
-                    "fillColor": fc,
-                    "color": bc,
-                    "weight": 1,
-                    "fillOpacity": 0.5,
-                },
-                tooltip=folium.GeoJsonTooltip(fields=["NAM"], aliases=["Plaza:"]),
+            capa_geojson(
+                subgdf,
+                {"fillColor": fill_col, "color": border_col, "weight": 1, "fillOpacity": 0.4},
+                campos=["PRK"],
+                aliases=["Parque:"],
             ).add_to(fg)
 
-            # ✅ Aquí mismo van los marcadores, usando `subgdf` (no `gdf_plazas`)
-            centroide = row.geometry.centroid
+        # --- Marcadores de punto en el centro de cada parque ---
+        for centroide, nombre, categoria in zip(
+            derivadas("parques", gdf_parques).centroide, gdf_parques["PRK"], gdf_parques["d_COA"]
+        ):
             folium.Marker(
                 location=[centroide.y, centroide.x],
-                icon=folium.Icon(color="darkblue", icon="square", prefix="fa"),
-                tooltip=row["NAM"],
-            ).add_to(fg)
-
-    # ---------------- Espacios Culturales ----------------
-    gdf_cultura = gpd.read_file("data/espaciosCulturales.geojson").to_crs("EPSG:4326")
-    gdf_cultura["Tipos"] = gdf_cultura["Tipos"]
-    gdf_cultura["Name"] = gdf_cultura["Name"].fillna("Sin nombre")
+                icon=folium.Icon(color="green", icon="tree", prefix="fa"),
+                tooltip=nombre,
+            ).add_to(grupos_parques.get(categoria, m))
 
-    grupos_cultura = {}
+        # ---------------- Centros Comerciales (GeoJSON) ----------------
+        gdf_cc = datos.centros_comerciales
 
-    # Crear un grupo de marcadores por tipo, pero con el mismo ícono para todos
-    for tipo, subgdf in gdf_cultura.groupby("Tipos"):
-        fg = folium.FeatureGroup(name=tipo).add_to(m)
-        grupos_cultura[tipo] = fg
+        cc_fg = folium.FeatureGroup(name="Centros Comerciales").add_to(m)
 
-        for _, row in subgdf.iterrows():
-            if row.geometry is None or not hasattr(row.geometry, "x"):
-                continue  # ignorar filas sin geometría válida
+        folium.GeoJson(
+            gdf_cc,
+            name="Centros Comerciales",
+            style_function=lambda feature: {
+                "fillColor": "#222222",  # negro
+                "color": "#000000",  # borde negro
+                "weight": 1,
+                "fillOpacity": 0.5,  # translúcido
+            },
+            tooltip=folium.GeoJsonTooltip(fields=["name"], aliases=["Centro Comercial:"]),
+        ).add_to(cc_fg)
 
+        # --- Marcadores de punto en el centro de cada centro comercial ---
+        for centroide, nombre in zip(derivadas("centros_comerciales", gdf_cc).centroide, gdf_cc["name"]):
             folium.Marker(
-                location=[row.geometry.y, row.geometry.x],
-                tooltip=row["Name"],
-                icon=folium.Icon(color="purple", icon="paint-brush", prefix="fa"),
-                popup=folium.Popup(
-                    folium.IFrame(
-                        html=f"<strong>{row['Name']}</strong><br>{row.get('descriptio', '')}",
-                        width=250,
-                        height=100,
-                    ),
-                    max_width=250,
-                ),
+                location=[centroide.y, centroide.x],
+                icon=folium.Icon(color="black", icon="shopping-bag", prefix="fa"),
+                tooltip=nombre,
+            ).add_to(cc_fg)
+
+        # ---------------- Plazas ----------------
+        gdf_plazas = datos.plazas
+
+        colores_plazas = {
+            "Plazoleta": "#00ffff",  # cyan puro
+            "Plaza": "#ff00ff",  # fucsia/neón
+            "Bulevard": "#ffff00",  # amarillo brillante
+            "Mirador": "#00ff00",  # verde fosforescente
+        }
+
+        grupos_plazas = {}
+
+        for categoria, subgdf in gdf_plazas.groupby("d_KCA"):
+            fg = folium.FeatureGroup(name=f"Plazas {categoria}").add_to(m)
+            grupos_plazas[categoria] = fg
+            fill_col = colores_plazas.get(categoria, "gray")
+            border_col = darken_color(fill_col, factor=0.6)
+
+            capa_geojson(
+                subgdf,
+                {"fillColor": fill_col, "color": border_col, "weight": 1, "fillOpacity": 0.5},
+                campos=["NAM"],
+                aliases=["Plaza:"],
+            ).add_to(fg)
+
+            # ✅ Aquí mismo van los marcadores, usando `subgdf` (no `gdf_plazas`)
+            centroides = derivadas("plazas", gdf_plazas).centroide.loc[subgdf.index]
+            for centroide, nombre in zip(centroides, subgdf["NAM"]):
+                folium.Marker(
+                    location=[centroide.y, centroide.x],
+                    icon=folium.Icon(color="darkblue", icon="square", prefix="fa"),
+                    tooltip=nombre,
+                ).add_to(fg)
+
+        # ---------------- Espacios Culturales ----------------
+        gdf_cultura = datos.espacios_culturales
+
+        grupos_cultura = {}
+
+        # Un grupo por tipo, con el mismo ícono para todos y clusters del servidor
+        for tipo in sorted(gdf_cultura["Tipos"].dropna().unique()):
+            fg = folium.FeatureGroup(name=tipo).add_to(m)
+            grupos_cultura[tipo] = fg
+            CapaTeselas(
+                url_clusters("cultura", tipo), {}, icono=icono_fa("paint-brush", "purple")
             ).add_to(fg)
 
     # 8. ---------------- Árbol de capas -----------------------
@@ -429,6 +465,14 @@ def mapa():
             "label": "Población Parroquias",
             "layer": fg_poblacion,
         },
+        {
+            "label": "Acceso a Transporte",
+            "layer": fg_acceso,
+        },
+        {
+            "label": "Densidad de Estudiantes",
+            "layer": fg_densidad,
+        },
         {
             "label": "Universidades",
             "select_all_checkbox": "Todas",
@@ -475,9 +519,9 @@ def mapa():
     facultades_por_nivel = {}
 
     for _, r in df_carr.iterrows():
-        nivel = r["NIVEL"].strip().upper()
-        facultad = r["FACULTAD"].strip()
-        carrera = r["CARRERA"].strip()
+        nivel = r["NIVEL"].upper()
+        facultad = r["FACULTAD"]
+        carrera = r["CARRERA"]
 
         if facultad.upper() == "SIN REGISTRO":
             continue
@@ -496,14 +540,27 @@ def mapa():
             facultades_por_nivel[nivel][fac] = sorted(facultades_por_nivel[nivel][fac])
 
     # 10. --------------- Render ------------------------------
+    with etapa("render"):
+        html_mapa = m.get_root().render()
+
     return render_template(
         "mapa_calor_estudiantes.html",
-        mapa=m.get_root().render(),  
+        mapa=html_mapa,  
         map_name=m.get_name(), 
         periodos=periodos,
         selected_periodo=selected_periodo,
         now=datetime.datetime.now(),
         facultades=facultades_por_nivel,
+        url_campus=url_for("api_capas.campus_carreras", v=datos.version),
+        coloreo_name=fg_coloreo.get_name(),
+        url_conteos=url_for("mapa_calor_estudiantes.conteos", v=datos.version),
+        acceso_name=fg_acceso.get_name(),
+        url_accesibilidad=url_for("mapa_calor_estudiantes.accesibilidad", v=datos.version),
+        densidad_name=capa_densidad.get_name(),
+        url_densidad=url_for("mapa_calor_estudiantes.densidad", v=datos.version),
+        gradientes=GRADIENTES_ESTUDIANTES,
+        gradiente_acceso=GRADIENTE_ACCESO,
+        distancia_saturacion=DISTANCIA_SATURACION_M,
         ruta_activa="estudiantes",
 
     )
\ No newline at end of file
@@ -0,0 +1,53 @@
+# =========================================================
+# 1. IMPORTACIONES Y CONFIGURACIÓN BÁSICA
+# =========================================================
+from flask import Blueprint, abort, current_app, request
+from utils.cache_paginas import obtener_o_construir, respuesta_cacheada
+from utils import clusters
+from utils.teselas import CAPAS, obtener_indice
+
+teselas_bp = Blueprint("teselas", __name__)
+
+ZOOM_MAXIMO = 22
+
+
+# =========================================================
+# 2. TESELAS GEOJSON POR CAPA
+# =========================================================
+@teselas_bp.route("/tiles/<capa>/<int:z>/<int:x>/<int:y>")
+def tesela(capa, z, x, y):
+    if capa not in CAPAS or z > ZOOM_MAXIMO or x >= 2**z or y >= 2**z:
+        abort(404)
+
+    cache = current_app.extensions["teselas"]["cache"]
+    clave = (capa, z, x, y)
+    entrada = obtener_o_construir(
+        cache, clave, lambda: obtener_indice(capa).tesela(z, x, y)
+    )
+
+    return respuesta_cacheada(
+        entrada, "application/json", current_app.config["CACHE_TESELAS_CONTROL"]
+    )
+
+
+# =========================================================
+# 3. CLUSTERS DE PUNTOS POR TESELA
+# =========================================================
+@teselas_bp.route("/clusters/<capa>/<int:z>/<int:x>/<int:y>")
+def tesela_clusters(capa, z, x, y):
+    if capa not in clusters.CAPAS or z > ZOOM_MAXIMO or x >= 2**z or y >= 2**z:
+        abort(404)
+    grupo = request.args.get("grupo")
+    # Un grupo inventado armaría y retendría un índice nuevo por cada valor
+    if grupo is not None and grupo not in clusters.grupos_capa(capa):
+        abort(404)
+
+    cache = current_app.extensions["teselas"]["cache"]
+    clave = ("clusters", capa, grupo, z, x, y)
+    entrada = obtener_o_construir(
+        cache, clave, lambda: clusters.obtener_indice_clusters(capa, grupo).tesela(z, x, y)
+    )
+
+    return respuesta_cacheada(
+        entrada, "application/json", current_app.config["CACHE_TESELAS_CONTROL"]
+    )
@@ -0,0 +1,148 @@
+// Capas cuyo contenido se pide al servidor en lugar de ir dentro del HTML.
+
+(function () {
+  // `estilo` es común a la capa; `estiloCampos` toma valores de cada feature
+  // (p. ej. {fillColor: "color"}) y `icono` dibuja los puntos como marcadores
+  // AwesomeMarkers en lugar de círculos. Los features con `cluster` (de
+  // /clusters/...) se dibujan como burbuja con el conteo.
+  function burbuja(latlng, propiedades) {
+    var n = propiedades.n;
+    var tam = n < 10 ? 30 : n < 100 ? 36 : n < 1000 ? 42 : 48;
+    var color = n < 10 ? "110, 204, 57" : n < 100 ? "240, 194, 12" : "241, 128, 23";
+    var html =
+      '<div style="width:' + tam + "px;height:" + tam + "px;line-height:" + tam +
+      "px;border-radius:50%;text-align:center;font:bold 12px sans-serif;" +
+      "background:rgba(" + color + ', 0.75);box-shadow:0 0 0 5px rgba(' + color +
+      ', 0.35);">' + n + "</div>";
+    return L.marker(latlng, {
+      icon: L.divIcon({ html: html, className: "", iconSize: [tam, tam] }),
+    });
+  }
+
+  function capaGeoJson(data, opciones) {
+    var campos = opciones.estiloCampos || {};
+    return L.geoJSON(data, {
+      style: function (feature) {
+        var estilo = L.extend({}, opciones.estilo);
+        for (var clave in campos) estilo[clave] = feature.properties[campos[clave]];
+        return estilo;
+      },
+      pointToLayer: function (feature, latlng) {
+        if (feature.properties && feature.properties.cluster) {
+          return burbuja(latlng, feature.properties);
+        }
+        if (opciones.icono) {
+          return L.marker(latlng, { icon: L.AwesomeMarkers.icon(opciones.icono) });
+        }
+        return L.circleMarker(latlng, opciones.estilo);
+      },
+      onEachFeature: function (feature, layer) {
+        var p = feature.properties || {};
+        if (p.tooltip) layer.bindTooltip(p.tooltip);
+        if (p.popup) layer.bindPopup(p.popup, { maxWidth: 250 });
+        if (p.cluster) {
+          layer.on("click", function (e) {
+            e.target._map.setView(e.latlng, p.expansion);
+          });
+        }
+      },
+    });
+  }
+
+  // Capa completa pedida a /api/layers/... la primera vez que el grupo se
+  // muestra en el mapa (al marcarlo en el control de capas). Al terminar,
+  // el grupo emite "capacargada" con la capa creada.
+  L.capaDiferida = function (grupo, url, opciones) {
+    var estado = "pendiente";
+    function cargar() {
+      if (estado !== "pendiente") return;
+      estado = "cargando";
+      fetch(url)
+        .then(function (r) { return r.json(); })
+        .then(function (data) {
+          var capa = capaGeoJson(data, opciones).addTo(grupo);
+          estado = "cargada";
+          grupo.fire("capacargada", { capa: capa });
+        })
+        .catch(function () { estado = "pendiente"; });
+    }
+    grupo.on("add", cargar);
+    if (grupo._map) cargar();
+  };
+
+  // Teselas GeoJSON /tiles/<capa>/{z}/{x}/{y}. Un feature que cae en varias
+  // teselas del mismo zoom se dibuja una sola vez (se cuenta por id y zoom y
+  // se quita al descargar la última tesela que lo contiene). La clave lleva
+  // el zoom porque la geometría se simplifica distinto en cada nivel: al
+  // acercar se dibuja la versión detallada y la gruesa se va con sus teselas.
+  L.GridLayer.GeoJSON = L.GridLayer.extend({
+    options: { estilo: {} },
+
+    initialize: function (url, options) {
+      this._url = url;
+      L.GridLayer.prototype.initialize.call(this, options);
+      this._grupo = L.featureGroup();
+      this._features = {};
+      this._porTesela = {};
+      this.on("tileunload", this._descargarTesela, this);
+    },
+
+    onAdd: function (map) {
+      L.GridLayer.prototype.onAdd.call(this, map);
+      this._grupo.addTo(map);
+    },
+
+    onRemove: function (map) {
+      L.GridLayer.prototype.onRemove.call(this, map);
+      map.removeLayer(this._grupo);
+    },
+
+    createTile: function (coords, done) {
+      var tile = document.createElement("div");
+      var key = this._tileCoordsToKey(coords);
+      var self = this;
+      fetch(L.Util.template(this._url, coords))
+        .then(function (r) { return r.json(); })
+        .then(function (data) {
+          var actual = self._tiles[key];
+          if (actual && actual.el === tile) self._cargarTesela(key, coords.z, data);
+          done(null, tile);
+        })
+        .catch(function (err) { done(err, tile); });
+      return tile;
+    },
+
+    _cargarTesela: function (key, z, data) {
+      var ids = [];
+      data.features.forEach(function (feature) {
+        var id = z + "/" + feature.id;
+        var f = this._features[id];
+        if (!f) {
+          f = { capa: capaGeoJson(feature, this.options), refs: 0 };
+          this._grupo.addLayer(f.capa);
+          this._features[id] = f;
+        }
+        f.refs += 1;
+        ids.push(id);
+      }, this);
+      this._porTesela[key] = ids;
+    },
+
+    _descargarTesela: function (e) {
+      var key = this._tileCoordsToKey(e.coords);
+      (this._porTesela[key] || []).forEach(function (id) {
+        var f = this._features[id];
+        f.refs -= 1;
+        if (f.refs === 0) {
+          this._grupo.removeLayer(f.capa);
+          delete this._features[id];
+        }
+      }, this);
+      delete this._porTesela[key];
+    },
+  });
+
+  L.gridLayer.geoJson = function (url, options) {
+    return new L.GridLayer.GeoJSON(url, options);
+  };
+})();
@@ -0,0 +1,48 @@
+// Decodificador mínimo de TopoJSON (arcos cuantizados en deltas) a GeoJSON.
+
+(function () {
+  function decodificarArcos(topo) {
+    var s = topo.transform.scale, t = topo.transform.translate;
+    return topo.arcs.map(function (arco) {
+      var x = 0, y = 0;
+      return arco.map(function (p) {
+        x += p[0];
+        y += p[1];
+        return [x * s[0] + t[0], y * s[1] + t[1]];
+      });
+    });
+  }
+
+  function anillo(arcos, indices) {
+    var coords = [];
+    indices.forEach(function (i, k) {
+      var arco = i < 0 ? arcos[~i].slice().reverse() : arcos[i];
+      coords.push.apply(coords, k ? arco.slice(1) : arco);
+    });
+    return coords;
+  }
+
+  function poligono(arcos, anillos) {
+    return anillos.map(function (indices) { return anillo(arcos, indices); });
+  }
+
+  // FeatureCollection del objeto `nombre` de la topología
+  L.topoJsonAGeoJson = function (topo, nombre) {
+    var arcos = decodificarArcos(topo);
+    return {
+      type: "FeatureCollection",
+      features: topo.objects[nombre].geometries.map(function (g) {
+        var geometria = null;
+        if (g.type === "Polygon") {
+          geometria = { type: "Polygon", coordinates: poligono(arcos, g.arcs) };
+        } else if (g.type === "MultiPolygon") {
+          geometria = {
+            type: "MultiPolygon",
+            coordinates: g.arcs.map(function (p) { return poligono(arcos, p); }),
+          };
+        }
+        return { type: "Feature", properties: g.properties || {}, geometry: geometria };
+      }),
+    };
+  };
+})();
@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+
+import geopandas as gpd
+import pandas as pd
+import pytest
+from shapely.geometry import box
+
+from utils import agregados, asignacion
+from utils.asignacion import IndiceAreas
+
+PARROQUIAS = gpd.GeoDataFrame(
+    {"nombre": ["A", "B"]}, geometry=[box(0, 0, 1, 1), box(1, 0, 2, 1)], crs="EPSG:4326"
+)
+
+
+def _datos(filas, version):
+    estudiantes = pd.DataFrame(filas, columns=["periodo", "Longitud", "Latitud"])
+    return SimpleNamespace(
+        estudiantes=estudiantes,
+        periodos=sorted(estudiantes["periodo"].unique()),
+        parroquias=PARROQUIAS,
+        version=version,
+        version_parroquias="parroquias-1",
+    )
+
+
+@pytest.fixture(autouse=True)
+def caches_vacios():
+    agregados._cache_estudiantes.clear()
+    asignacion._cache_indices.clear()
+    yield
+    agregados._cache_estudiantes.clear()
+    asignacion._cache_indices.clear()
+
+
+@pytest.fixture
+def asignados(monkeypatch):
+    """Cantidad de puntos de cada llamada a `IndiceAreas.asignar`."""
+    llamadas = []
+    original = IndiceAreas.asignar
+
+    def espia(self, lon, lat, *args, **kwargs):
+        llamadas.append(len(lon))
+        return original(self, lon, lat, *args, **kwargs)
+
+    monkeypatch.setattr(IndiceAreas, "asignar", espia)
+    return llamadas
+
+
+VIEJAS = [("202410", 0.5, 0.5), ("202410", 1.5, 0.5), ("202420", 0.2, 0.2)]
+
+
+def test_periodo_nuevo_solo_asigna_sus_filas(asignados):
+    agregados.tabla_estudiantes(_datos(VIEJAS, "v1"))
+    assert asignados == [3]
+
+    datos = _datos(VIEJAS + [("202510", 1.5, 0.5), ("202510", 1.2, 0.8)], "v2")
+    tabla = agregados.tabla_estudiantes(datos)
+    assert asignados == [3, 2]
+
+    conteo = tabla.set_index(["periodo", "nombre"])["n_estudiantes"].to_dict()
+    assert conteo == {
+        ("202410", "A"): 1,
+        ("202410", "B"): 1,
+        ("202420", "A"): 1,
+        ("202510", "B"): 2,
+    }
+
+
+def test_misma_version_no_recalcula(asignados):
+    datos = _datos(VIEJAS, "v1")
+    agregados.tabla_estudiantes(datos)
+    agregados.tabla_estudiantes(datos)
+    assert asignados == [3]
+
+
+def test_periodo_modificado_se_reasigna(asignados):
+    agregados.tabla_estudiantes(_datos(VIEJAS, "v1"))
+    cambiadas = VIEJAS[:2] + [("202420", 1.7, 0.2)]
+    tabla = agregados.tabla_estudiantes(_datos(cambiadas, "v2"))
+    assert asignados == [3, 1]
+    assert tabla[tabla["periodo"] == "202420"]["nombre"].tolist() == ["B"]
+
+
+def test_tabla_instalada_solo_asigna_periodos_nuevos(asignados):
+    viejos = _datos(VIEJAS, "v1")
+    tabla = agregados._contar_por_parroquia(viejos.estudiantes, PARROQUIAS)
+    huellas = agregados.huellas_periodos(viejos.estudiantes)
+    asignados.clear()
+
+    # Como al arrancar con artefactos armados antes de agregar un periodo
+    datos = _datos(VIEJAS + [("202510", 0.4, 0.4)], "v2")
+    agregados.instalar_tabla_estudiantes(datos, tabla, huellas)
+    tabla = agregados.tabla_estudiantes(datos)
+    assert asignados == [1]
+    assert sorted(tabla["periodo"].unique()) == ["202410", "202420", "202510"]
@@ -0,0 +1,34 @@
+import pytest
+from flask import Flask
+
+from utils import cache_paginas
+
+CUERPO = "x" * 4096
+
+
+def _respuesta(app, cache, accept_encoding):
+    with app.test_request_context("/", headers={"Accept-Encoding": accept_encoding}):
+        entrada = cache.guardar("clave", CUERPO)
+        return cache_paginas.respuesta_cacheada(entrada, "text/plain", "no-cache")
+
+
+def test_sin_brotli_no_ofrece_br(monkeypatch):
+    monkeypatch.setattr(cache_paginas, "brotli", None)
+    app = Flask(__name__)
+    cache = cache_paginas.CacheLRU(1024 * 1024)
+
+    resp = _respuesta(app, cache, "br")
+    assert resp.status_code == 200
+    assert "Content-Encoding" not in resp.headers
+    assert resp.get_data(as_text=True) == CUERPO
+
+    resp = _respuesta(app, cache, "br, gzip")
+    assert resp.headers["Content-Encoding"] == "gzip"
+
+
+def test_con_brotli_prefiere_br():
+    if cache_paginas.brotli is None:
+        pytest.skip("brotli no está instalado")
+    app = Flask(__name__)
+    resp = _respuesta(app, cache_paginas.CacheLRU(1024 * 1024), "gzip, br")
+    assert resp.headers["Content-Encoding"] == "br"
@@ -0,0 +1,29 @@
+import numpy as np
+
+from utils import hexagonos
+
+QUITO = (-78.6, -0.4, -78.3, 0.0)
+
+
+def test_contar_descarta_atipicos_y_nan():
+    lon = np.array([-78.50, -78.50, -78.45, -0.52, np.nan, -78.48])
+    lat = np.array([-0.20, -0.20, -0.15, 38.99, -0.18, np.nan])
+
+    ids, conteos = hexagonos.contar(lon, lat, 500, QUITO)
+
+    esperados, esperados_conteo = hexagonos.contar(lon[:3], lat[:3], 500)
+    assert ids.tolist() == esperados.tolist()
+    assert conteos.tolist() == esperados_conteo.tolist()
+    assert conteos.sum() == 3
+
+
+def test_contar_sin_limites_cuenta_el_atipico_aparte():
+    # El atípico es un hexágono más: no se arma una malla hasta él
+    ids, conteos = hexagonos.contar([-78.5, -0.52, np.nan], [-0.2, 38.99, 0.0], 500)
+    assert len(ids) == 2
+    assert conteos.tolist() == [1, 1]
+
+
+def test_contar_vacio():
+    ids, conteos = hexagonos.contar([np.nan], [np.nan], 500, QUITO)
+    assert len(ids) == 0 and len(conteos) == 0
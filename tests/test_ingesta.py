@@ -0,0 +1,30 @@
+import pandas as pd
+
+from utils import ingesta
+
+
+def _leer_dobles(ruta):
+    df = pd.read_csv(ruta)
+    df["valor"] = df["valor"] * 2
+    return df
+
+
+def _leer_triples(ruta):
+    df = pd.read_csv(ruta)
+    df["valor"] = df["valor"] * 3
+    return df
+
+
+def test_cambiar_el_lector_reconstruye_la_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingesta, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(ingesta, "MANIFIESTO_PATH", str(tmp_path / "cache" / "manifiesto.json"))
+    fuente = tmp_path / "fuente.csv"
+    fuente.write_text("valor\n1\n2\n")
+
+    monkeypatch.setitem(ingesta.LECTORES, "prueba", _leer_dobles)
+    assert ingesta.cargar_tabla("prueba", str(fuente))["valor"].tolist() == [2, 4]
+    # Mismo archivo y mismo lector: se sirve la caché
+    assert ingesta.cargar_tabla("prueba", str(fuente))["valor"].tolist() == [2, 4]
+
+    monkeypatch.setitem(ingesta.LECTORES, "prueba", _leer_triples)
+    assert ingesta.cargar_tabla("prueba", str(fuente))["valor"].tolist() == [3, 6]
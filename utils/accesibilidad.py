@@ -0,0 +1,208 @@
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from utils.asignacion import indice_areas
+from utils.geometrias import CRS_GEOGRAFICO, CRS_METRICO, coordenadas_transporte, transformador
+
+# Lado de la celda del índice de paradas, en metros
+CELDA_M = 250
+
+# Distancias de referencia para "a pie" (porcentaje de estudiantes a ≤ d)
+UMBRALES_M = (300, 500)
+
+# Anillos que revisa cada nivel antes de pasar los puntos que quedan (lejos
+# de todo) a un nivel con celdas FACTOR_NIVEL veces más grandes
+ANILLOS_POR_NIVEL = 4
+FACTOR_NIVEL = 2
+# Un nivel con a lo sumo estas celdas ya no tiene otro más grueso
+CELDAS_MINIMAS = 1024
+
+# Puntos por bloque de consulta: acota la memoria temporal
+BLOQUE = 100_000
+
+# Por fila de `datos.estudiantes`: parroquia (-1 si ninguna), parada más
+# cercana (posición en `coordenadas_transporte`) y distancia en metros
+Distancias = namedtuple("Distancias", ["parroquia", "parada", "metros"])
+
+_cache_indices = {}
+_cache_distancias = {}
+_lock = threading.Lock()
+
+
+# =========================================================
+# Índice de grilla para vecino más cercano
+# =========================================================
+class IndiceCercania:
+    """Puntos métricos en una grilla uniforme para buscar el más cercano.
+
+    Los puntos se ordenan por celda y cada celda guarda su rango (inicio,
+    cuenta). Una consulta revisa anillos de celdas alrededor de la suya y
+    termina cuando la mejor distancia no puede mejorar con el anillo
+    siguiente; todo por bloques de NumPy, sin un objeto por punto.
+
+    Celdas finas rinden donde hay muchas paradas pero obligan a muchos
+    anillos donde no hay ninguna: tras `ANILLOS_POR_NIVEL` anillos los puntos
+    sin resolver siguen en un índice de celdas más grandes, con la mejor
+    distancia hallada como cota.
+    """
+
+    def __init__(self, x, y, celda=CELDA_M):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.celda = celda
+        self.x0, self.y0 = self.x.min(), self.y.min()
+        self.nx = int((self.x.max() - self.x0) // celda) + 1
+        self.ny = int((self.y.max() - self.y0) // celda) + 1
+
+        claves = self._columna(self.x) * self.ny + self._fila(self.y)
+        self.orden = np.argsort(claves, kind="stable")
+        self.cuenta = np.bincount(claves, minlength=self.nx * self.ny)
+        self.inicio = np.concatenate([[0], np.cumsum(self.cuenta)[:-1]])
+
+        self.grueso = None
+        if self.nx * self.ny > CELDAS_MINIMAS:
+            self.grueso = IndiceCercania(x, y, celda * FACTOR_NIVEL)
+
+    def _columna(self, x):
+        return np.floor((x - self.x0) / self.celda).astype(np.int64)
+
+    def _fila(self, y):
+        return np.floor((y - self.y0) / self.celda).astype(np.int64)
+
+    def mas_cercano(self, x, y, bloque=BLOQUE):
+        """(id, distancia) del punto del índice más cercano a cada (x, y)."""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        ids = np.full(len(x), -1, dtype=np.int64)
+        d2 = np.full(len(x), np.inf)
+        for inicio in range(0, len(x), bloque):
+            fin = inicio + bloque
+            self._bloque(x[inicio:fin], y[inicio:fin], ids[inicio:fin], d2[inicio:fin])
+        return ids, np.sqrt(d2)
+
+    def _bloque(self, x, y, ids, d2):
+        """Actualiza `ids` y `d2` (distancia al cuadrado) de los puntos (x, y)."""
+        cx, cy = self._columna(x), self._fila(y)
+        # Distancia del punto al borde de su celda: lo mínimo que aporta cada anillo
+        margen = np.minimum.reduce(
+            [
+                x - (self.x0 + cx * self.celda),
+                self.x0 + (cx + 1) * self.celda - x,
+                y - (self.y0 + cy * self.celda),
+                self.y0 + (cy + 1) * self.celda - y,
+            ]
+        )
+        activos = np.arange(len(x))
+        if self.grueso is not None:
+            anillos = ANILLOS_POR_NIVEL
+        else:
+            # Un punto fuera de la grilla puede necesitar anillos hasta cubrirla
+            anillos = max(self.nx - cx.min(), cx.max() + 1, self.ny - cy.min(), cy.max() + 1, 1)
+        for r in range(anillos + 1):
+            self._revisar(activos, cx, cy, _anillo(r), x, y, ids, d2)
+            # Todo lo no revisado está a más de r celdas más el margen
+            limite = r * self.celda + margen[activos]
+            activos = activos[d2[activos] > limite**2]
+            if len(activos) == 0:
+                return
+
+        sub_ids, sub_d2 = ids[activos], d2[activos]
+        self.grueso._bloque(x[activos], y[activos], sub_ids, sub_d2)
+        ids[activos], d2[activos] = sub_ids, sub_d2
+
+    def _revisar(self, activos, cx, cy, desplazamientos, x, y, ids, d2):
+        """Compara los `activos` con todos los puntos de las celdas desplazadas."""
+        dx, dy = desplazamientos
+        cxs = (cx[activos][:, None] + dx).ravel()
+        cys = (cy[activos][:, None] + dy).ravel()
+        dueno = np.repeat(activos, len(dx))
+        validos = (cxs >= 0) & (cxs < self.nx) & (cys >= 0) & (cys < self.ny)
+        clave = cxs[validos] * self.ny + cys[validos]
+        dueno = dueno[validos]
+        cuenta = self.cuenta[clave]
+        llenas = cuenta > 0
+        if not llenas.any():
+            return
+        clave, dueno, cuenta = clave[llenas], dueno[llenas], cuenta[llenas]
+
+        # Un par (punto, candidato) por cada punto de cada celda revisada
+        total = cuenta.sum()
+        desde = np.repeat(self.inicio[clave], cuenta)
+        desde += np.arange(total) - np.repeat(np.cumsum(cuenta) - cuenta, cuenta)
+        cand = self.orden[desde]
+        dueno = np.repeat(dueno, cuenta)
+        d = (self.x[cand] - x[dueno]) ** 2 + (self.y[cand] - y[dueno]) ** 2
+
+        np.minimum.at(d2, dueno, d)
+        gana = d == d2[dueno]
+        ids[dueno[gana]] = cand[gana]
+
+
+def _anillo(r):
+    """Desplazamientos (dx, dy) de las celdas a distancia de Chebyshev `r`."""
+    if r == 0:
+        return np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64)
+    lado = np.arange(-r, r + 1)
+    interior = lado[1:-1]
+    dx = np.concatenate([lado, lado, np.full(len(interior), -r), np.full(len(interior), r)])
+    dy = np.concatenate([np.full(len(lado), -r), np.full(len(lado), r), interior, interior])
+    return dx, dy
+
+
+# =========================================================
+# Distancia de cada estudiante al transporte público
+# =========================================================
+def indice_transporte(datos):
+    """`IndiceCercania` de paradas y centroides de estaciones (bus y metro)."""
+    with _lock:
+        if datos.version not in _cache_indices:
+            xy = coordenadas_transporte(datos)
+            x, y = transformador(CRS_GEOGRAFICO, CRS_METRICO).transform(xy[:, 0], xy[:, 1])
+            _cache_indices.clear()  # solo se conserva la versión vigente
+            _cache_indices[datos.version] = IndiceCercania(x, y)
+        return _cache_indices[datos.version]
+
+
+def distancias_estudiantes(datos):
+    """`Distancias` de todas las filas de estudiantes, una vez por versión de datos."""
+    indice = indice_transporte(datos)
+    with _lock:
+        if datos.version not in _cache_distancias:
+            df = datos.estudiantes
+            lon, lat = df["Longitud"].to_numpy(float), df["Latitud"].to_numpy(float)
+            x, y = transformador(CRS_GEOGRAFICO, CRS_METRICO).transform(lon, lat)
+            parada, metros = indice.mas_cercano(x, y)
+            parroquia = indice_areas("parroquias", datos.parroquias.geometry.values).asignar(
+                lon, lat
+            )
+            _cache_distancias.clear()
+            _cache_distancias[datos.version] = Distancias(parroquia, parada, metros)
+        return _cache_distancias[datos.version]
+
+
+def accesibilidad_por_parroquia(datos, periodo):
+    """Por parroquia (alineado con `datos.parroquias`): estudiantes, mediana de
+    distancia a la parada más cercana y % a ≤ cada umbral de `UMBRALES_M`.
+
+    Las parroquias sin estudiantes quedan con mediana y porcentajes NaN.
+    """
+    d = distancias_estudiantes(datos)
+    filas = (datos.estudiantes["periodo"].to_numpy() == periodo) & (d.parroquia >= 0)
+    df = pd.DataFrame({"parroquia": d.parroquia[filas], "metros": d.metros[filas]})
+    for umbral in UMBRALES_M:
+        df[f"pct_{umbral}"] = (df["metros"] <= umbral) * 100.0
+
+    grupos = df.groupby("parroquia")
+    resultado = pd.DataFrame(
+        {
+            "n": grupos.size(),
+            "mediana_m": grupos["metros"].median(),
+            **{f"pct_{u}": grupos[f"pct_{u}"].mean() for u in UMBRALES_M},
+        }
+    )
+    resultado = resultado.reindex(range(len(datos.parroquias)))
+    resultado["n"] = resultado["n"].fillna(0).astype(int)
+    return resultado
@@ -0,0 +1,89 @@
+import threading
+
+import pandas as pd
+
+from utils.asignacion import indice_areas
+
+# versión de parroquias -> (versión de datos, tabla (periodo, nombre,
+# n_estudiantes), huella de cada periodo ya asignado)
+_cache_estudiantes = {}
+_lock = threading.Lock()
+
+
+def _contar_por_parroquia(df_est, gdf_parroquias):
+    """Asigna cada estudiante a su parroquia y cuenta por (periodo, nombre)."""
+    ids = indice_areas("parroquias", gdf_parroquias.geometry.values).asignar(
+        df_est["Longitud"].to_numpy(), df_est["Latitud"].to_numpy()
+    )
+    dentro = ids >= 0
+    asignados = pd.DataFrame(
+        {
+            "periodo": df_est["periodo"].to_numpy()[dentro],
+            "nombre": gdf_parroquias["nombre"].to_numpy()[ids[dentro]],
+        }
+    )
+    return asignados.groupby(["periodo", "nombre"]).size().reset_index(name="n_estudiantes")
+
+
+def huellas_periodos(df_est):
+    """Por periodo: (filas, suma de los hashes de sus coordenadas).
+
+    Detecta periodos nuevos, quitados o con filas cambiadas sin comparar
+    las filas una a una.
+    """
+    hashes = pd.util.hash_pandas_object(df_est[["Longitud", "Latitud"]], index=False)
+    grupos = hashes.groupby(df_est["periodo"].to_numpy())
+    return {
+        periodo: (int(n), int(suma))
+        for periodo, n, suma in zip(grupos.size().index, grupos.size(), grupos.sum())
+    }
+
+
+def tabla_estudiantes(datos):
+    """Tabla (periodo, nombre, n_estudiantes) de todos los periodos.
+
+    Se guarda por versión de la geometría de parroquias, no de todos los
+    datos: si cambian los estudiantes solo se asignan las filas de los
+    periodos nuevos o modificados y el resto de la tabla se reutiliza.
+    """
+    with _lock:
+        version, tabla, hechos = _cache_estudiantes.get(
+            datos.version_parroquias, (None, None, {})
+        )
+        if version == datos.version:
+            return tabla
+
+        huellas = huellas_periodos(datos.estudiantes)
+        faltan = [p for p in datos.periodos if hechos.get(p) != huellas[p]]
+        if tabla is not None:
+            vigentes = [p for p in datos.periodos if p not in faltan]
+            tabla = tabla[tabla["periodo"].isin(vigentes)]
+        if faltan:
+            df_all = datos.estudiantes
+            nuevos = _contar_por_parroquia(
+                df_all[df_all["periodo"].isin(faltan)], datos.parroquias
+            )
+            tabla = nuevos if tabla is None else pd.concat([tabla, nuevos], ignore_index=True)
+        _cache_estudiantes.clear()  # solo se conserva la versión vigente
+        _cache_estudiantes[datos.version_parroquias] = (datos.version, tabla, huellas)
+        return tabla
+
+
+def instalar_tabla_estudiantes(datos, tabla, huellas, version=None):
+    """Registra una tabla ya calculada (p. ej. leída de artefactos/).
+
+    `huellas` son las de los periodos con que se armó; `version`, la
+    versión de datos si se sabe que los estudiantes no cambiaron desde
+    entonces. Con None, el primer uso compara huellas y asigna solo los
+    periodos nuevos o modificados.
+    """
+    with _lock:
+        _cache_estudiantes.clear()
+        _cache_estudiantes[datos.version_parroquias] = (version, tabla, huellas)
+
+
+def estudiantes_por_parroquia(datos, periodo):
+    """Estudiantes del periodo por parroquia, alineado con `datos.parroquias`."""
+    tabla = tabla_estudiantes(datos)
+    conteo = tabla[tabla["periodo"] == periodo].set_index("nombre")["n_estudiantes"]
+    return datos.parroquias["nombre"].map(conteo).fillna(0).astype(int)
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import time
+
+import click
+import geopandas as gpd
+import pyarrow.feather as feather
+
+from utils import agregados, asignacion, geometrias, grilla, piramide
+from utils.agregados import huellas_periodos, instalar_tabla_estudiantes, tabla_estudiantes
+from utils.datos import CSV_EST, DATA_DIR, obtener_datos
+from utils.grilla import (
+    CRS_METRICO,
+    instalar_grilla,
+    instalar_piezas,
+    lado_mediana,
+    obtener_grilla,
+    piezas_alimentadores,
+    piezas_parroquias,
+)
+from utils.ingesta import _escribir_atomico, hash_archivo
+from utils.piramide import geometrias_nivel, instalar_nivel, tolerancias_usadas
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ARTEFACTOS_DIR = os.path.join(BASE_DIR, "..", "artefactos")
+MANIFIESTO = "manifiesto.json"
+
+# Subir al cambiar qué se guarda o cómo (columnas, CRS, archivos)
+FORMATO = 3
+
+# Módulos que calculan lo que se guarda: si cambia su código, los
+# artefactos viejos dejan de valer aunque los datos sean los mismos
+MODULOS_DERIVADOS = (agregados, asignacion, geometrias, grilla, piramide)
+
+FUENTES = ("parroquias", "alimentadores")
+PIEZAS = {"parroquias": piezas_parroquias, "alimentadores": piezas_alimentadores}
+
+
+def _capa(datos, fuente):
+    return getattr(datos, fuente)
+
+
+# =========================================================
+# Construcción (flask build-cache)
+# =========================================================
+def hashes_entradas():
+    """Hash de cada archivo de data/ del que se derivan los artefactos."""
+    return {
+        nombre: hash_archivo(os.path.join(DATA_DIR, nombre))
+        for nombre in sorted(os.listdir(DATA_DIR))
+        if os.path.isfile(os.path.join(DATA_DIR, nombre))
+    }
+
+
+def version_codigo():
+    """Huella del código de `MODULOS_DERIVADOS`."""
+    h = hashlib.sha256()
+    for modulo in MODULOS_DERIVADOS:
+        with open(modulo.__file__, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+def limpiar_derivados():
+    """Vacía los cachés de proceso que `cargar` pudo haber llenado."""
+    for cache in (
+        grilla._cache_lados, grilla._cache_grillas, grilla._cache_piezas,
+        piramide._cache_coberturas, piramide._cache_niveles,
+        agregados._cache_estudiantes, geometrias._cache_derivadas,
+        asignacion._cache_indices,
+    ):
+        cache.clear()
+
+
+def construir(directorio=ARTEFACTOS_DIR, log=print):
+    """Calcula todos los artefactos derivados y los escribe en `directorio`.
+
+    Se recalcula todo desde los datos: al arrancar la app ya instaló los
+    artefactos existentes, que podrían estar vencidos.
+    """
+    datos = obtener_datos()
+    limpiar_derivados()
+    os.makedirs(directorio, exist_ok=True)
+    archivos, lados = {}, {}
+
+    def guardar(nombre, df, geo=True):
+        inicio = time.perf_counter()
+        ruta = os.path.join(directorio, f"{nombre}.feather")
+        if geo:
+            _escribir_atomico(ruta, lambda tmp: df.to_feather(tmp, compression="uncompressed"))
+        else:
+            _escribir_atomico(
+                ruta, lambda tmp: feather.write_feather(df, tmp, compression="uncompressed")
+            )
+        archivos[nombre] = os.path.basename(ruta)
+        log(f"  {nombre}: {len(df)} filas en {time.perf_counter() - inicio:.2f}s")
+
+    for fuente in FUENTES:
+        gdf = _capa(datos, fuente)
+        lados[fuente] = lado_mediana(fuente, gdf)
+        guardar(f"grilla_{fuente}", obtener_grilla(fuente, gdf))
+        guardar(f"piezas_{fuente}", PIEZAS[fuente](gdf))
+        for tolerancia in tolerancias_usadas():
+            guardar(
+                f"piramide_{fuente}_{tolerancia}",
+                gpd.GeoDataFrame(
+                    geometry=geometrias_nivel(fuente, gdf, tolerancia), crs=gdf.crs
+                ),
+            )
+
+    guardar("estudiantes_periodo", tabla_estudiantes(datos), geo=False)
+    huellas = huellas_periodos(datos.estudiantes)
+
+    manifiesto = {
+        "formato": FORMATO,
+        "version_codigo": version_codigo(),
+        "version_datos": datos.version,
+        "entradas": hashes_entradas(),
+        "lados": lados,
+        "archivos": archivos,
+        # Por periodo de la tabla de estudiantes: [filas, suma de hashes]
+        "huellas_estudiantes": {p: list(h) for p, h in huellas.items()},
+    }
+
+    def escribir(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifiesto, f, indent=2, sort_keys=True)
+
+    _escribir_atomico(os.path.join(directorio, MANIFIESTO), escribir)
+    return manifiesto
+
+
+# =========================================================
+# Carga al arrancar
+# =========================================================
+def cargar(datos, directorio=ARTEFACTOS_DIR):
+    """Instala los artefactos en los cachés si corresponden a estos datos.
+
+    Devuelve False (y no instala nada) si no hay artefactos o fueron
+    construidos con otros datos, otro formato u otro código: en ese caso se
+    calculan al usarlos. Si solo cambió el CSV de estudiantes se instala
+    todo igual: la tabla de estudiantes se completa al usarla asignando
+    solo los periodos cuya huella no coincide.
+    """
+    try:
+        with open(os.path.join(directorio, MANIFIESTO), encoding="utf-8") as f:
+            manifiesto = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+    if (
+        manifiesto.get("formato") != FORMATO
+        or manifiesto.get("version_codigo") != version_codigo()
+    ):
+        return False
+    guardadas, actuales = manifiesto.get("entradas", {}), hashes_entradas()
+    cambiadas = {
+        nombre
+        for nombre in guardadas.keys() | actuales.keys()
+        if guardadas.get(nombre) != actuales.get(nombre)
+    }
+    if not cambiadas <= {os.path.basename(CSV_EST)}:
+        return False
+
+    archivos = manifiesto["archivos"]
+
+    def leer(nombre):
+        # Mapeado en memoria: pyarrow no copia el archivo a un búfer propio
+        # (las geometrías sí se decodifican al pasar a GeoDataFrame)
+        tabla = feather.read_table(os.path.join(directorio, archivos[nombre]), memory_map=True)
+        return gpd.GeoDataFrame.from_arrow(tabla)
+
+    for fuente in FUENTES:
+        instalar_grilla(
+            fuente, manifiesto["lados"][fuente], leer(f"grilla_{fuente}"), CRS_METRICO
+        )
+        instalar_piezas(fuente, leer(f"piezas_{fuente}"))
+        for tolerancia in tolerancias_usadas():
+            nombre = f"piramide_{fuente}_{tolerancia}"
+            if nombre in archivos:
+                instalar_nivel(fuente, tolerancia, leer(nombre).geometry.values)
+
+    tabla = feather.read_table(
+        os.path.join(directorio, archivos["estudiantes_periodo"]), memory_map=True
+    ).to_pandas()
+    huellas = {p: tuple(h) for p, h in manifiesto["huellas_estudiantes"].items()}
+    instalar_tabla_estudiantes(
+        datos, tabla, huellas, version=None if cambiadas else datos.version
+    )
+    return True
+
+
+def init_app(app):
+    app.config.setdefault("ARTEFACTOS_DIR", ARTEFACTOS_DIR)
+
+    @app.cli.command("build-cache")
+    def build_cache():
+        """Precalcula grillas, piezas, pirámide y conteos en artefactos/."""
+        directorio = app.config["ARTEFACTOS_DIR"]
+        click.echo(f"Construyendo artefactos en {os.path.abspath(directorio)}")
+        inicio = time.perf_counter()
+        manifiesto = construir(directorio, log=click.echo)
+        click.echo(
+            f"{len(manifiesto['archivos'])} artefactos "
+            f"(datos {manifiesto['version_datos']}) en {time.perf_counter() - inicio:.2f}s"
+        )
+
+    with app.app_context():
+        cargado = cargar(obtener_datos(), app.config["ARTEFACTOS_DIR"])
+    app.extensions["artefactos"] = cargado
+    return cargado
@@ -0,0 +1,67 @@
+import threading
+
+import numpy as np
+import shapely
+
+# Puntos por bloque: acota la memoria temporal con millones de filas
+BLOQUE = 1_000_000
+
+_cache_indices = {}
+_lock = threading.Lock()
+
+
+class IndiceAreas:
+    """Polígonos preparados para asignar coordenadas sueltas a un área.
+
+    Trabaja directo sobre arreglos lon/lat: no crea un objeto geométrico por
+    punto. Los puntos de cada bloque se ordenan por x una vez; cada polígono
+    toma con `searchsorted` los que caen en su rango de x, filtra por su rango
+    de y y resuelve el resto con `shapely.contains_xy`.
+    """
+
+    def __init__(self, geometrias):
+        self.geoms = np.asarray(geometrias, dtype=object)
+        shapely.prepare(self.geoms)
+        self.limites = shapely.bounds(self.geoms)
+
+    def asignar(self, lon, lat, bloque=BLOQUE):
+        """Id (posición) del polígono que contiene cada punto, -1 si ninguno.
+
+        Igual que ``predicate="within"``: un punto sobre el borde no cuenta.
+        Si los polígonos se solapan gana el de menor id.
+        """
+        x = np.asarray(lon, dtype=float)
+        y = np.asarray(lat, dtype=float)
+        ids = np.full(len(x), -1, dtype=np.int64)
+        for inicio in range(0, len(x), bloque):
+            fin = inicio + bloque
+            self._asignar_bloque(x[inicio:fin], y[inicio:fin], ids[inicio:fin])
+        return ids
+
+    def _asignar_bloque(self, x, y, ids):
+        orden = np.argsort(x, kind="stable")
+        xs = x[orden]
+        desde = np.searchsorted(xs, self.limites[:, 0], side="left")
+        hasta = np.searchsorted(xs, self.limites[:, 2], side="right")
+
+        for i in np.flatnonzero(hasta > desde):
+            _, miny, _, maxy = self.limites[i]
+            cand = orden[desde[i] : hasta[i]]
+            cand = cand[(y[cand] >= miny) & (y[cand] <= maxy) & (ids[cand] < 0)]
+            if len(cand):
+                dentro = shapely.contains_xy(self.geoms[i], x[cand], y[cand])
+                ids[cand[dentro]] = i
+
+
+def indice_areas(fuente, geometrias):
+    """`IndiceAreas` de una capa, cacheado por proceso bajo `fuente`."""
+    with _lock:
+        if fuente not in _cache_indices:
+            _cache_indices[fuente] = IndiceAreas(geometrias)
+        return _cache_indices[fuente]
+
+
+def contar_por_area(fuente, geometrias, lon, lat):
+    """Cantidad de puntos dentro de cada polígono, en el orden de `geometrias`."""
+    ids = indice_areas(fuente, geometrias).asignar(lon, lat)
+    return np.bincount(ids[ids >= 0], minlength=len(geometrias))
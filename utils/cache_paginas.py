@@ -0,0 +1,178 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+from flask import current_app, request
+
+from utils.datos import obtener_datos
+from utils.perfil import etapa, marcar, perfilando
+
+try:
+    import brotli
+except ImportError:  # sin brotli se sirve gzip o sin comprimir
+    brotli = None
+
+# `comprimidos`: {"br": bytes, "gzip": bytes}, generados una vez al guardar
+Entrada = namedtuple("Entrada", ["cuerpo", "etag", "comprimidos"])
+
+# Preferencia al negociar: brotli primero si la variante existe
+CODIFICACIONES = ("br", "gzip")
+
+# Por debajo de este tamaño no vale la pena comprimir
+MIN_BYTES_COMPRIMIR = 512
+
+# 10-11 comprimen ~8% más pero tardan segundos en una página de 2-3 MB
+CALIDAD_BROTLI = 9
+
+
+def comprimir(cuerpo):
+    """Variantes comprimidas de `cuerpo`; se generan una sola vez al guardar."""
+    if len(cuerpo) < MIN_BYTES_COMPRIMIR:
+        return {}
+    comprimidos = {"gzip": gzip.compress(cuerpo, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        comprimidos["br"] = brotli.compress(cuerpo, quality=CALIDAD_BROTLI)
+    return comprimidos
+
+
+def tamano(entrada):
+    """Bytes que ocupa la entrada con todas sus variantes."""
+    return len(entrada.cuerpo) + sum(len(c) for c in entrada.comprimidos.values())
+
+
+class CacheLRU:
+    """LRU de respuestas serializadas, limitada por tamaño total en bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.hits += 1
+            return entrada
+
+    def guardar(self, clave, texto, comprimible=True):
+        """Guarda `texto` (str o bytes); `comprimible=False` para PNG y similares."""
+        cuerpo = texto if isinstance(texto, bytes) else texto.encode("utf-8")
+        entrada = Entrada(
+            cuerpo,
+            hashlib.sha256(cuerpo).hexdigest()[:32],
+            comprimir(cuerpo) if comprimible else {},
+        )
+        if tamano(entrada) > self.max_bytes:
+            return entrada  # no cabe: se sirve sin cachear
+
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self.bytes -= tamano(anterior)
+            self._entradas[clave] = entrada
+            self.bytes += tamano(entrada)
+            while self.bytes > self.max_bytes:
+                _, vieja = self._entradas.popitem(last=False)
+                self.bytes -= tamano(vieja)
+        return entrada
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.bytes = 0
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "entradas": len(self._entradas),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def init_app(app):
+    app.config.setdefault("CACHE_PAGINAS_MAX_BYTES", 256 * 1024 * 1024)
+    app.config.setdefault("CACHE_PAGINAS_CONTROL", "public, max-age=0, must-revalidate")
+    cache = CacheLRU(app.config["CACHE_PAGINAS_MAX_BYTES"])
+    app.extensions["cache_paginas"] = cache
+    return cache
+
+
+def negociar(entrada):
+    """Codificación a usar según Accept-Encoding: "br", "gzip" o None.
+
+    Solo se ofrecen las variantes que existen (sin brotli no hay "br").
+    """
+    ofrecidas = [c for c in CODIFICACIONES if c in entrada.comprimidos]
+    if not ofrecidas:
+        return None
+    return request.accept_encodings.best_match(ofrecidas)
+
+
+def respuesta_cacheada(entrada, mimetype, cache_control):
+    """Respuesta con ETag fuerte; 304 si el cliente ya tiene esa versión.
+
+    Sirve la variante ya comprimida que acepte el cliente; cada variante
+    tiene su propio ETag y la respuesta varía según Accept-Encoding.
+    """
+    codificacion = negociar(entrada)
+    if codificacion is None:
+        resp = current_app.response_class(entrada.cuerpo, mimetype=mimetype)
+        resp.set_etag(entrada.etag)
+    else:
+        resp = current_app.response_class(
+            entrada.comprimidos[codificacion], mimetype=mimetype
+        )
+        resp.headers["Content-Encoding"] = codificacion
+        resp.set_etag(f"{entrada.etag}-{codificacion}")
+    resp.vary.add("Accept-Encoding")
+    resp.headers["Cache-Control"] = cache_control
+    return resp.make_conditional(request)
+
+
+def obtener_o_construir(cache, clave, construir, comprimible=True):
+    """Entrada cacheada de `clave`, o la construye con `construir()` y la guarda.
+
+    Con ?_profile=1 siempre se construye, para que el perfil mida la vista.
+    """
+    entrada = None if perfilando() else cache.obtener(clave)
+    marcar("cache", "hit" if entrada is not None else "miss")
+    if entrada is None:
+        texto = construir()
+        with etapa("comprimir"):
+            entrada = cache.guardar(clave, texto, comprimible)
+    return entrada
+
+
+def pagina_cacheada(vista):
+    """Cachea el HTML de una vista que solo depende de `periodo` y los datos.
+
+    La clave es (endpoint, periodo, versión de datos); la respuesta lleva un
+    ETag fuerte para que las visitas repetidas reciban 304 Not Modified.
+    """
+
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        datos = obtener_datos()
+        cache = current_app.extensions["cache_paginas"]
+        periodo = datos.periodo_valido(request.args.get("periodo"))
+        clave = (request.endpoint, periodo, datos.version)
+
+        entrada = obtener_o_construir(cache, clave, lambda: vista(*args, **kwargs))
+
+        return respuesta_cacheada(
+            entrada, "text/html", current_app.config["CACHE_PAGINAS_CONTROL"]
+        )
+
+    return envoltura
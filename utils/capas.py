@@ -0,0 +1,192 @@
+import folium
+from branca.element import MacroElement
+from folium.elements import JSCSSMixin
+from jinja2 import Template
+
+from utils.topojson import OBJETO, topologia
+
+
+def feature_collection(gdf, campos=()):
+    """FeatureCollection con solo las columnas `campos` como propiedades."""
+    campos = list(dict.fromkeys(campos))
+    gdf = gdf[[*campos, gdf.geometry.name]].reset_index(drop=True)
+    return gdf.to_geo_dict()
+
+
+def capa_geojson(
+    gdf, estilo, campos=(), aliases=None, estilo_campos=None, tooltip=None, **kwargs
+):
+    """Un solo `folium.GeoJson` para todo el GeoDataFrame.
+
+    `estilo` es el estilo común de la capa y `estilo_campos` asocia claves de
+    estilo a columnas con el valor de cada feature (p. ej. ``{"fillColor":
+    "color"}``). Con `aliases` se arma un tooltip sobre `campos`.
+    """
+    estilo_campos = estilo_campos or {}
+    datos = feature_collection(gdf, [*campos, *estilo_campos.values()])
+
+    def style_function(feature):
+        props = feature["properties"]
+        return {**estilo, **{k: props[col] for k, col in estilo_campos.items()}}
+
+    if tooltip is None and aliases is not None:
+        tooltip = folium.GeoJsonTooltip(fields=list(campos), aliases=aliases)
+    return folium.GeoJson(datos, style_function=style_function, tooltip=tooltip, **kwargs)
+
+
+class CapaTopoJson(folium.TopoJson):
+    """`folium.TopoJson` decodificado con static/js/topojson.js.
+
+    El estilo se arma en el cliente (común + columnas por feature) en lugar de
+    copiarse dentro de cada feature como hace `folium.TopoJson`.
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.geoJson(
+                L.topoJsonAGeoJson({{ this.data|tojson }}, {{ this.objeto|tojson }}),
+                {
+                    style: function (feature) {
+                        var estilo = Object.assign({}, {{ this.estilo|tojson }});
+                        {%- for clave, campo in this.estilo_campos.items() %}
+                        estilo[{{ clave|tojson }}] = feature.properties[{{ campo|tojson }}];
+                        {%- endfor %}
+                        return estilo;
+                    },
+                }
+            ).addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+        """
+    )
+
+    default_js = [("topojson_ligero", "/static/js/topojson.js")]
+
+    def __init__(self, data, estilo, estilo_campos=None, tooltip=None, **kwargs):
+        super().__init__(data, f"objects.{OBJETO}", tooltip=tooltip, **kwargs)
+        self._name = "CapaTopoJson"
+        self.objeto = OBJETO
+        self.estilo = estilo
+        self.estilo_campos = estilo_campos or {}
+
+    def style_data(self):
+        """El estilo no se guarda en los datos: lo calcula el cliente."""
+
+
+def capa_topojson(
+    gdf, estilo, campos=(), aliases=None, estilo_campos=None, tooltip=None, **kwargs
+):
+    """Como `capa_geojson`, pero embebe la capa como TopoJSON cuantizado.
+
+    Los bordes compartidos se escriben una sola vez; conviene para capas de
+    polígonos vecinos (parroquias, alimentadores, grillas).
+    """
+    estilo_campos = estilo_campos or {}
+    datos = topologia(gdf, [*campos, *estilo_campos.values()])
+    if tooltip is None and aliases is not None:
+        tooltip = folium.GeoJsonTooltip(fields=list(campos), aliases=aliases)
+    return CapaTopoJson(datos, estilo, estilo_campos, tooltip=tooltip, **kwargs)
+
+
+def icono_fa(icono, color):
+    """Opciones de `L.AwesomeMarkers.icon` equivalentes a `folium.Icon`."""
+    return {
+        "icon": icono,
+        "prefix": "fa",
+        "markerColor": color,
+        "iconColor": "white",
+        "extraClasses": "fa-rotate-0",
+    }
+
+
+class CapaTeselas(JSCSSMixin, MacroElement):
+    """Capa GeoJSON cargada por teselas desde `/tiles/<capa>/{z}/{x}/{y}`.
+
+    También sirve para los clusters de `/clusters/<capa>/{z}/{x}/{y}`.
+
+    Se agrega a un FeatureGroup; las teselas solo se piden mientras el grupo
+    está visible en el mapa.
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.gridLayer.geoJson(
+                {{ this.url|tojson }},
+                {{ this.opciones|tojson }}
+            ).addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+        """
+    )
+
+    default_js = [("capas_remotas", "/static/js/capas_remotas.js")]
+
+    def __init__(self, url, estilo, min_zoom=None, icono=None):
+        super().__init__()
+        self._name = "CapaTeselas"
+        self.url = url
+        self.opciones = {"estilo": estilo}
+        if icono:
+            self.opciones["icono"] = icono
+        if min_zoom is not None:
+            self.opciones["minZoom"] = min_zoom
+
+
+class CapaDiferida(JSCSSMixin, MacroElement):
+    """Capa GeoJSON que se pide a `url` la primera vez que su grupo se muestra.
+
+    Se agrega a un FeatureGroup (normalmente con ``show=False``); mientras el
+    usuario no lo marque en el control de capas no viaja ningún dato.
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            L.capaDiferida(
+                {{ this._parent.get_name() }},
+                {{ this.url|tojson }},
+                {{ this.opciones|tojson }}
+            );
+        {% endmacro %}
+        """
+    )
+
+    default_js = [("capas_remotas", "/static/js/capas_remotas.js")]
+
+    def __init__(self, url, estilo, estilo_campos=None, icono=None):
+        super().__init__()
+        self._name = "CapaDiferida"
+        self.url = url
+        self.opciones = {"estilo": estilo}
+        if estilo_campos:
+            self.opciones["estiloCampos"] = estilo_campos
+        if icono:
+            self.opciones["icono"] = icono
+
+
+class CapaImagen(MacroElement):
+    """Imagen servida por la app (`url` relativa) sobre `limites` [[s, o], [n, e]].
+
+    `folium.raster_layers.ImageOverlay` trata las rutas relativas como
+    archivos locales; esta capa deja la URL tal cual para que el navegador la
+    pida al mostrarse el grupo.
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.imageOverlay(
+                {{ this.url|tojson }},
+                {{ this.limites|tojson }},
+                {{ this.opciones|tojson }}
+            ).addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, url, limites, opacidad=1.0):
+        super().__init__()
+        self._name = "CapaImagen"
+        self.url = url
+        self.limites = limites
+        self.opciones = {"opacity": opacidad, "interactive": False}
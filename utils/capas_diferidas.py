@@ -0,0 +1,77 @@
+from collections import namedtuple
+
+import geopandas as gpd
+import pandas as pd
+from flask import url_for
+
+from utils.cache_paginas import CacheLRU
+from utils.datos import obtener_datos
+from utils.geometrias import derivadas
+
+# `por_periodo`: el contenido cambia con el periodo y va en la clave de caché
+Capa = namedtuple("Capa", ["constructor", "por_periodo"])
+
+
+# =========================================================
+# Capas que se piden al servidor al activarlas en el control
+# =========================================================
+def _estaciones(fuente, gdf, tooltips):
+    """Polígonos de las estaciones más un punto en su centroide (para el icono)."""
+    poligonos = gpd.GeoDataFrame({"tooltip": tooltips}, geometry=gdf.geometry.values, crs=gdf.crs)
+    puntos = poligonos.set_geometry(derivadas(fuente, gdf).centroide.values)
+    return pd.concat([poligonos, puntos], ignore_index=True)
+
+
+def _capa_estaciones_buses(datos, periodo):
+    return _estaciones("buses", datos.buses, ["Estación de Bus"] * len(datos.buses))
+
+
+def _capa_estaciones_metro(datos, periodo):
+    nombres = "Estación de metro: " + datos.metro["nam"].fillna("Desconocida")
+    return _estaciones("metro", datos.metro, nombres.tolist())
+
+
+CAPAS = {
+    "estaciones_buses": Capa(_capa_estaciones_buses, False),
+    "estaciones_metro": Capa(_capa_estaciones_metro, False),
+}
+
+# Capas diferidas que ofrece cada página
+PAGINAS = {
+    "main": {"estaciones_buses", "estaciones_metro"},
+    "colegios": {"estaciones_buses", "estaciones_metro"},
+    "empresas": {"estaciones_buses", "estaciones_metro"},
+    "universidades": {"estaciones_buses", "estaciones_metro"},
+}
+
+
+def registrar_capa(nombre, constructor, paginas, por_periodo=False):
+    """Agrega una capa diferida y la habilita en las `paginas` indicadas."""
+    CAPAS[nombre] = Capa(constructor, por_periodo)
+    for pagina in paginas:
+        PAGINAS.setdefault(pagina, set()).add(nombre)
+
+
+def init_app(app):
+    app.config.setdefault("CACHE_CAPAS_MAX_BYTES", 64 * 1024 * 1024)
+    app.config.setdefault("CACHE_CAPAS_CONTROL", "public, max-age=86400")
+    app.extensions["capas_diferidas"] = CacheLRU(app.config["CACHE_CAPAS_MAX_BYTES"])
+
+
+def geojson_capa(capa, periodo):
+    """FeatureCollection (texto JSON) de la capa, con `tooltip` como propiedad."""
+    gdf = CAPAS[capa].constructor(obtener_datos(), periodo)
+    return gdf.to_crs("EPSG:4326").to_json(drop_id=True)
+
+
+def url_capa(pagina, capa, periodo=None):
+    """URL de la capa; la versión de datos invalida el caché HTTP."""
+    if not CAPAS[capa].por_periodo:
+        periodo = None
+    return url_for(
+        "api_capas.capa",
+        pagina=pagina,
+        capa=capa,
+        periodo=periodo,
+        v=obtener_datos().version,
+    )
@@ -0,0 +1,56 @@
+import threading
+
+import numpy as np
+
+_cache_indices = {}
+_lock = threading.Lock()
+
+
+class IndiceCarreras:
+    """Índice invertido carrera ↔ campus de la oferta de un periodo.
+
+    Los ids de campus son posiciones en `datos.universidades`. La oferta
+    (`baseCarreras.xlsx`) va por universidad, así que una carrera abarca
+    todos los campus de su universidad.
+    """
+
+    def __init__(self, universidades, carreras):
+        campus_por_uni = {
+            uni: np.asarray(pos, dtype=np.int64)
+            for uni, pos in universidades.groupby("UNIVERSIDAD").indices.items()
+        }
+        vacio = np.empty(0, dtype=np.int64)
+
+        self.campus_por_carrera = {
+            carrera: np.unique(np.concatenate([campus_por_uni.get(u, vacio) for u in unis]))
+            for carrera, unis in carreras.groupby("CARRERA")["UNIVERSIDAD"].unique().items()
+        }
+        self.carreras_por_campus = {i: [] for i in range(len(universidades))}
+        for carrera, campus in sorted(self.campus_por_carrera.items()):
+            for i in campus.tolist():
+                self.carreras_por_campus[i].append(carrera)
+
+    def campus(self, carreras):
+        """Ids (ordenados) de los campus que ofrecen alguna de `carreras`."""
+        vacio = np.empty(0, dtype=np.int64)
+        partes = [self.campus_por_carrera.get(c, vacio) for c in carreras]
+        return np.unique(np.concatenate(partes)) if partes else vacio
+
+    def ofrece(self, carrera):
+        """True si `carrera` está en esta oferta."""
+        return carrera in self.campus_por_carrera
+
+    def carreras(self, campus):
+        """Carreras del campus `campus` en esta oferta."""
+        return self.carreras_por_campus.get(campus, [])
+
+
+def indice_carreras(datos, periodo):
+    """`IndiceCarreras` de la oferta del periodo, cacheado por proceso."""
+    clave = (datos.version, periodo)
+    with _lock:
+        if clave not in _cache_indices:
+            _cache_indices[clave] = IndiceCarreras(
+                datos.universidades, datos.carreras_periodo(periodo)
+            )
+        return _cache_indices[clave]
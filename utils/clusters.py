@@ -0,0 +1,221 @@
+import json
+from collections import namedtuple
+from urllib.parse import urlencode
+
+import numpy as np
+import shapely
+from flask import current_app, request
+
+from utils.asignacion import indice_areas
+from utils.datos import obtener_datos
+
+# Radio de agrupación en píxeles de pantalla (como supercluster)
+RADIO_PX = 60
+TAMANO_TESELA = 256
+# Desde ZOOM_MAXIMO + 1 se sirven los puntos sueltos
+ZOOM_MAXIMO = 16
+
+# Un nivel de la jerarquía, ordenado por x. `x`, `y`: Web Mercator en [0, 1]
+# (y crece hacia el sur, como las teselas); `n`: puntos del cluster;
+# `punto`: índice del punto original si n == 1; `expansion`: zoom en el que
+# el cluster se separa en dos o más.
+Nivel = namedtuple("Nivel", ["x", "y", "n", "punto", "expansion"])
+
+
+# =========================================================
+# Capas agrupables: lon, lat, grupo y propiedades de cada punto
+# =========================================================
+def _capa_colegios(datos):
+    df = datos.colegios
+    return {
+        "lon": df["LONGITUD"].to_numpy(float),
+        "lat": df["LATITUD"].to_numpy(float),
+        "grupo": df["TIPO"].to_numpy(),
+        "propiedades": [{"tooltip": nombre} for nombre in df["COLEGIO"]],
+    }
+
+
+def _capa_empresas(datos):
+    """Empresas dentro del distrito (asignadas a alguna parroquia)."""
+    df = datos.empresas
+    lon, lat = df["LONGITUD"].to_numpy(float), df["LATITUD"].to_numpy(float)
+    dentro = indice_areas("parroquias", datos.parroquias.geometry.values).asignar(lon, lat) >= 0
+    return {
+        "lon": lon[dentro],
+        "lat": lat[dentro],
+        "grupo": np.full(dentro.sum(), None),
+        "propiedades": [{"tooltip": nombre} for nombre in df["EMPRESA"][dentro]],
+    }
+
+
+def _capa_cultura(datos):
+    gdf = datos.espacios_culturales
+    gdf = gdf[shapely.get_type_id(gdf.geometry.values) == shapely.GeometryType.POINT]
+    xy = shapely.get_coordinates(gdf.geometry.values)
+    return {
+        "lon": xy[:, 0],
+        "lat": xy[:, 1],
+        "grupo": gdf["Tipos"].to_numpy(),
+        "propiedades": [
+            {
+                "tooltip": nombre,
+                "popup": f"<strong>{nombre}</strong><br>{desc if isinstance(desc, str) else ''}",
+            }
+            for nombre, desc in zip(gdf["Name"], gdf["descriptio"])
+        ],
+    }
+
+
+CAPAS = {
+    "colegios": _capa_colegios,
+    "empresas": _capa_empresas,
+    "cultura": _capa_cultura,
+}
+
+
+# =========================================================
+# Jerarquía de clusters
+# =========================================================
+def mercator(lon, lat):
+    """Coordenadas Web Mercator normalizadas: (0, 0) noroeste, (1, 1) sureste."""
+    lon = np.asarray(lon, dtype=float)
+    lat = np.clip(np.asarray(lat, dtype=float), -85.0511, 85.0511)
+    seno = np.sin(np.radians(lat))
+    return lon / 360.0 + 0.5, 0.5 - np.log((1 + seno) / (1 - seno)) / (4 * np.pi)
+
+
+def lonlat(x, y):
+    lon = (np.asarray(x) - 0.5) * 360.0
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * np.asarray(y)))))
+    return lon, lat
+
+
+def _ordenar(nivel):
+    orden = np.argsort(nivel.x, kind="stable")
+    return Nivel(*(campo[orden] for campo in nivel))
+
+
+class IndiceClusters:
+    """Clusters precalculados para cada zoom, servidos por tesela.
+
+    Como supercluster, cada nivel se arma agrupando el nivel siguiente (más
+    detallado), así un cluster es siempre la unión de sus hijos. En lugar de
+    vecinos por radio se agrupa por celdas de `RADIO_PX` píxeles: todo el
+    nivel sale de un `np.unique` y unos `bincount`, sin bucles por punto.
+    """
+
+    def __init__(self, lon, lat, propiedades):
+        x, y = mercator(lon, lat)
+        n = len(x)
+        puntos = Nivel(x, y, np.ones(n), np.arange(n), np.full(n, ZOOM_MAXIMO + 1))
+        self.propiedades = [json.dumps(p, ensure_ascii=False) for p in propiedades]
+        self.niveles = {ZOOM_MAXIMO + 1: _ordenar(puntos)}
+
+        hijo = self.niveles[ZOOM_MAXIMO + 1]
+        for z in range(ZOOM_MAXIMO, -1, -1):
+            self.niveles[z] = hijo = self._agrupar(hijo, z)
+
+    @staticmethod
+    def _agrupar(hijo, z):
+        if len(hijo.x) == 0:
+            return hijo
+        celdas_eje = int(np.ceil(TAMANO_TESELA * 2**z / RADIO_PX))
+        cx = np.minimum((hijo.x * celdas_eje).astype(np.int64), celdas_eje - 1)
+        cy = np.minimum((hijo.y * celdas_eje).astype(np.int64), celdas_eje - 1)
+        _, padre = np.unique(cx * celdas_eje + cy, return_inverse=True)
+        padre = padre.ravel()
+
+        n = np.bincount(padre, weights=hijo.n)
+        x = np.bincount(padre, weights=hijo.x * hijo.n) / n
+        y = np.bincount(padre, weights=hijo.y * hijo.n) / n
+        hijos = np.bincount(padre)
+
+        # Con un solo hijo, el cluster hereda su punto y su zoom de expansión
+        unico = np.empty(len(n), dtype=np.int64)
+        unico[padre] = np.arange(len(padre))
+        expansion = np.where(hijos > 1, z + 1, hijo.expansion[unico])
+        punto = np.where(n == 1, hijo.punto[unico], -1)
+
+        return _ordenar(Nivel(x, y, n.astype(np.int64), punto, expansion))
+
+    def tesela(self, z, x, y):
+        """FeatureCollection (texto JSON) con los clusters cuyo centro cae en la tesela.
+
+        Cada cluster cae en una sola tesela, así que no hay duplicados.
+        """
+        nivel = self.niveles[min(z, ZOOM_MAXIMO + 1)]
+        escala = 2.0**z
+        desde = np.searchsorted(nivel.x, x / escala, side="left")
+        hasta = np.searchsorted(nivel.x, (x + 1) / escala, side="left")
+        idx = np.arange(desde, hasta)
+        idx = idx[(nivel.y[idx] >= y / escala) & (nivel.y[idx] < (y + 1) / escala)]
+
+        lon, lat = lonlat(nivel.x[idx], nivel.y[idx])
+        features = []
+        for i, lo, la in zip(idx.tolist(), lon.tolist(), lat.tolist()):
+            punto = int(nivel.punto[i])
+            if punto >= 0:
+                propiedades = self.propiedades[punto]
+            else:
+                propiedades = json.dumps(
+                    {"cluster": True, "n": int(nivel.n[i]), "expansion": int(nivel.expansion[i])}
+                )
+            features.append(
+                f'{{"type":"Feature","id":"{z}-{i}",'
+                f'"geometry":{{"type":"Point","coordinates":[{lo:.6f},{la:.6f}]}},'
+                f'"properties":{propiedades}}}'
+            )
+        return f'{{"type":"FeatureCollection","features":[{",".join(features)}]}}'
+
+
+# =========================================================
+# Índices por capa y grupo
+# =========================================================
+def construir_indice(datos, capa, grupo=None):
+    puntos = CAPAS[capa](datos)
+    seleccion = np.ones(len(puntos["lon"]), dtype=bool)
+    if grupo is not None:
+        seleccion = puntos["grupo"] == grupo
+    return IndiceClusters(
+        puntos["lon"][seleccion],
+        puntos["lat"][seleccion],
+        [p for p, s in zip(puntos["propiedades"], seleccion) if s],
+    )
+
+
+def grupos_capa(capa):
+    """Grupos (texto) que se pueden pedir de la capa; vacío si no tiene."""
+    estado = current_app.extensions["teselas"]
+    clave = ("grupos", capa)
+    with estado["lock"]:
+        if clave not in estado["indices"]:
+            grupos = CAPAS[capa](obtener_datos())["grupo"]
+            estado["indices"][clave] = frozenset(g for g in grupos if isinstance(g, str))
+        return estado["indices"][clave]
+
+
+def obtener_indice_clusters(capa, grupo=None):
+    """Índice de la capa (y grupo), compartido con los índices de teselas.
+
+    `grupo` debe ser None o uno de `grupos_capa(capa)`: cada índice queda
+    en memoria hasta que cambian los datos.
+    """
+    if grupo is not None and grupo not in grupos_capa(capa):
+        raise KeyError(grupo)
+    estado = current_app.extensions["teselas"]
+    clave = ("clusters", capa, grupo)
+    with estado["lock"]:
+        if clave not in estado["indices"]:
+            estado["indices"][clave] = construir_indice(obtener_datos(), capa, grupo)
+        return estado["indices"][clave]
+
+
+def url_clusters(capa, grupo=None):
+    """Plantilla de URL para Leaflet, como `url_teselas`."""
+    url = (
+        f"{request.script_root}/clusters/{capa}/{{z}}/{{x}}/{{y}}"
+        f"?v={obtener_datos().version}"
+    )
+    if grupo is not None:
+        url += "&" + urlencode({"grupo": grupo})
+    return url
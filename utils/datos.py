@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+
+import geopandas as gpd
+import pandas as pd
+from flask import current_app
+
+from utils.ingesta import cargar_tabla, hash_archivo
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "..", "data")
+
+# Rutas de archivos
+EXCEL_PATH = os.path.join(DATA_DIR, "universidades_colegios.xlsx")
+CARRERAS_PATH = os.path.join(DATA_DIR, "baseCarreras.xlsx")
+EMPRESAS_PATH = os.path.join(DATA_DIR, "ubicacionesEmpresas.xlsx")
+POBLACION_PATH = os.path.join(DATA_DIR, "poblacionParroquias.xlsx")
+CSV_EST = os.path.join(DATA_DIR, "ubicacionEstudiantesPeriodo.csv")
+GJSON_RURAL = os.path.join(DATA_DIR, "parroquiasRurales.geojson")
+GJSON_URB = os.path.join(DATA_DIR, "parroquiasUrbanas.geojson")
+GJSON_BUSES = os.path.join(DATA_DIR, "estacionesBuses.geojson")
+GJSON_METRO = os.path.join(DATA_DIR, "estacionesMetro.geojson")
+GJSON_PARADAS = os.path.join(DATA_DIR, "paradasBuses.geojson")
+GJSON_ALIMENTADORES = os.path.join(DATA_DIR, "alimentadores.geojson")
+GJSON_PARQUES = os.path.join(DATA_DIR, "parques.geojson")
+GJSON_PLAZAS = os.path.join(DATA_DIR, "plazas.geojson")
+GJSON_CC = os.path.join(DATA_DIR, "centros_comerciales.geojson")
+GJSON_CULTURA = os.path.join(DATA_DIR, "espaciosCulturales.geojson")
+JSON_ALIMENTADORES = os.path.join(DATA_DIR, "idAlimentadores.json")
+
+
+class RegistroDatos:
+    """Datos de entrada cargados una sola vez por proceso.
+
+    Los DataFrames son compartidos entre peticiones: las rutas deben
+    tratarlos como de solo lectura y trabajar sobre copias si necesitan
+    modificarlos.
+    """
+
+    def __init__(self):
+        self.cargado = False
+
+    def cargar(self):
+        # Estudiantes y periodos
+        self.estudiantes = cargar_tabla("estudiantes", CSV_EST)
+        self.periodos = sorted(self.estudiantes["periodo"].unique())
+
+        # Parroquias
+        gdf_rurales = gpd.read_file(GJSON_RURAL).rename(columns={"DPA_DESPAR": "nombre"})
+        gdf_urbanas = gpd.read_file(GJSON_URB).rename(columns={"dpa_despar": "nombre"})
+        gdf_rurales["tipo"] = "rural"
+        gdf_urbanas["tipo"] = "urbana"
+        gdf_parroquias = pd.concat(
+            [
+                gdf_rurales[["nombre", "geometry", "tipo"]],
+                gdf_urbanas[["nombre", "geometry", "tipo"]],
+            ],
+            ignore_index=True,
+        ).set_crs("EPSG:4326")
+        gdf_parroquias["nombre"] = gdf_parroquias["nombre"].str.strip()
+        self.parroquias = gdf_parroquias
+
+        # Población por parroquia
+        self.poblacion = cargar_tabla("poblacion", POBLACION_PATH)
+
+        # Transporte
+        self.buses = gpd.read_file(GJSON_BUSES).to_crs("EPSG:4326")
+        self.metro = gpd.read_file(GJSON_METRO).to_crs("EPSG:4326")
+        self.paradas = gpd.read_file(GJSON_PARADAS).to_crs("EPSG:4326")
+
+        # Alimentadores
+        self.alimentadores = gpd.read_file(GJSON_ALIMENTADORES).to_crs("EPSG:4326")
+        with open(JSON_ALIMENTADORES, encoding="utf-8") as f:
+            self.alimentador_nombres = {
+                item["code"]: item["name"] for item in json.load(f)["codedValues"]
+            }
+
+        # Universidades, colegios, carreras y empresas
+        self.universidades = cargar_tabla("universidades", EXCEL_PATH)
+        self.colegios = cargar_tabla("colegios", EXCEL_PATH)
+        self.carreras = cargar_tabla("carreras", CARRERAS_PATH)
+        self.empresas = cargar_tabla("empresas", EMPRESAS_PATH)
+
+        # Parques, plazas, centros comerciales y espacios culturales
+        gdf_parques = gpd.read_file(GJSON_PARQUES).to_crs("EPSG:4326")
+        gdf_parques["PRK"] = gdf_parques["PRK"].fillna("Sin nombre")
+        self.parques = gdf_parques
+
+        gdf_plazas = gpd.read_file(GJSON_PLAZAS).to_crs("EPSG:4326")
+        gdf_plazas["NAM"] = gdf_plazas["NAM"].fillna("Sin nombre")
+        gdf_plazas["d_KCA"] = gdf_plazas["d_KCA"].fillna("Desconocido")
+        self.plazas = gdf_plazas
+
+        # Solo las columnas usadas: el resto trae listas que no se serializan
+        gdf_cc = gpd.read_file(GJSON_CC).to_crs("EPSG:4326")
+        self.centros_comerciales = gdf_cc[["name", "geometry"]]
+
+        gdf_cultura = gpd.read_file(GJSON_CULTURA).to_crs("EPSG:4326")
+        gdf_cultura["Name"] = gdf_cultura["Name"].fillna("Sin nombre")
+        self.espacios_culturales = gdf_cultura
+
+        self.version = version_datos()
+        # Solo la geometría de parroquias: lo que reutiliza la tabla de estudiantes
+        self.version_parroquias = version_archivos([GJSON_RURAL, GJSON_URB])
+        self.cargado = True
+        return self
+
+    def periodo_valido(self, periodo):
+        """Devuelve `periodo` si existe en los datos, si no el primero."""
+        return periodo if periodo in self.periodos else self.periodos[0]
+
+    def carreras_periodo(self, periodo):
+        """Oferta de carreras vigente para un periodo de estudiantes."""
+        df_carr = self.carreras
+        if periodo in ["202410", "202420"]:
+            return df_carr[df_carr["PERIODO"].isin([periodo, "202400"])]
+        return df_carr[df_carr["PERIODO"].isin([periodo, "202520"])]
+
+
+def version_archivos(rutas):
+    """Huella del nombre y el contenido de los archivos `rutas`."""
+    h = hashlib.sha256()
+    for ruta in rutas:
+        h.update(os.path.basename(ruta).encode("utf-8"))
+        h.update(hash_archivo(ruta).encode("ascii"))
+    return h.hexdigest()[:16]
+
+
+def version_datos():
+    """Huella del contenido de data/: cambia si cambia cualquier archivo."""
+    rutas = (os.path.join(DATA_DIR, nombre) for nombre in sorted(os.listdir(DATA_DIR)))
+    return version_archivos([ruta for ruta in rutas if os.path.isfile(ruta)])
+
+
+def init_app(app, registro=None):
+    registro = registro or RegistroDatos()
+    if not registro.cargado:
+        registro.cargar()
+    app.extensions["datos"] = registro
+    return registro
+
+
+def obtener_datos():
+    return current_app.extensions["datos"]
@@ -0,0 +1,101 @@
+import io
+from collections import namedtuple
+
+import matplotlib
+import numpy as np
+from PIL import Image
+
+# Tamaño de píxel y radio de suavizado, en metros sobre el terreno
+PIXEL_M = 50
+SIGMA_M = 150
+
+# El núcleo gaussiano se corta a este número de sigmas
+CORTE_SIGMAS = 3
+
+# Percentil de la densidad (entre píxeles con algo) que satura la escala
+PERCENTIL_SATURACION = 99.5
+ALFA_MAXIMO = 210
+
+# Por debajo de esta fracción del techo el píxel queda transparente
+UMBRAL_VISIBLE = 0.01
+
+METROS_POR_GRADO = 111_320
+
+# limites: (oeste, sur, este, norte) en grados; ancho/alto en píxeles
+Malla = namedtuple("Malla", ["limites", "ancho", "alto"])
+
+
+# =========================================================
+# Raster de densidad (histograma + convolución FFT)
+# =========================================================
+def malla(limites, pixel_m=PIXEL_M):
+    """Malla de píxeles de ~`pixel_m` metros que cubre `limites` (EPSG:4326)."""
+    oeste, sur, este, norte = limites
+    lat_media = np.radians((sur + norte) / 2)
+    ancho = int(np.ceil((este - oeste) * METROS_POR_GRADO * np.cos(lat_media) / pixel_m))
+    alto = int(np.ceil((norte - sur) * METROS_POR_GRADO / pixel_m))
+    return Malla(tuple(limites), max(ancho, 1), max(alto, 1))
+
+
+def histograma(lon, lat, m):
+    """Puntos por píxel; la fila 0 es el borde norte (orden de imagen)."""
+    oeste, sur, este, norte = m.limites
+    conteo, _, _ = np.histogram2d(
+        lat, lon, bins=[m.alto, m.ancho], range=[[sur, norte], [oeste, este]]
+    )
+    return conteo[::-1]
+
+
+def nucleo_gaussiano(sigma_px):
+    radio = max(int(np.ceil(CORTE_SIGMAS * sigma_px)), 1)
+    eje = np.arange(-radio, radio + 1)
+    g = np.exp(-0.5 * (eje / sigma_px) ** 2)
+    nucleo = np.outer(g, g)
+    return nucleo / nucleo.sum()
+
+
+def suavizar(rejilla, sigma_px):
+    """Convolución lineal (sin efecto de borde circular) con un núcleo gaussiano.
+
+    Se hace en frecuencia: el costo depende del tamaño del raster, no de la
+    cantidad de puntos que cayeron en él.
+    """
+    nucleo = nucleo_gaussiano(sigma_px)
+    radio = nucleo.shape[0] // 2
+    forma = (rejilla.shape[0] + 2 * radio, rejilla.shape[1] + 2 * radio)
+    espectro = np.fft.rfft2(rejilla, forma) * np.fft.rfft2(nucleo, forma)
+    alto, ancho = rejilla.shape
+    suave = np.fft.irfft2(espectro, forma)[radio : radio + alto, radio : radio + ancho]
+    return np.clip(suave, 0, None)  # quita el ruido numérico negativo
+
+
+def densidad(lon, lat, limites, pixel_m=PIXEL_M, sigma_m=SIGMA_M):
+    """Raster de densidad de kernel (puntos por píxel, suavizado)."""
+    m = malla(limites, pixel_m)
+    return suavizar(histograma(lon, lat, m), sigma_m / pixel_m)
+
+
+# =========================================================
+# Imagen
+# =========================================================
+def colorear(raster, cmap="YlOrRd"):
+    """RGBA uint8: color y opacidad crecen con la densidad; vacío transparente."""
+    positivos = raster[raster > 1e-9]
+    techo = np.percentile(positivos, PERCENTIL_SATURACION) if len(positivos) else 1.0
+    t = np.clip(raster / techo, 0, 1)
+
+    lut = (matplotlib.colormaps[cmap](np.linspace(0, 1, 256)) * 255).astype(np.uint8)
+    rgba = lut[(t * 255).astype(np.uint8)]
+    rgba[..., 3] = np.where(t < UMBRAL_VISIBLE, 0, np.sqrt(t) * ALFA_MAXIMO).astype(np.uint8)
+    return rgba
+
+
+def png(rgba):
+    salida = io.BytesIO()
+    Image.fromarray(rgba, "RGBA").save(salida, format="PNG")
+    return salida.getvalue()
+
+
+def imagen_densidad(lon, lat, limites, pixel_m=PIXEL_M, sigma_m=SIGMA_M):
+    """PNG listo para un ImageOverlay con esos `limites`."""
+    return png(colorear(densidad(lon, lat, limites, pixel_m, sigma_m)))
@@ -0,0 +1,82 @@
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyproj
+import shapely
+
+CRS_GEOGRAFICO = "EPSG:4326"
+CRS_METRICO = "EPSG:32717"
+
+# Derivados de una capa, alineados con su índice. `metrico`: geometría en
+# CRS_METRICO; `centroide` y `representativo`: calculados en metros y
+# devueltos en EPSG:4326.
+Derivadas = namedtuple(
+    "Derivadas", ["metrico", "area_m2", "centroide", "representativo"]
+)
+
+_cache_derivadas = {}
+_lock = threading.Lock()
+
+
+# =========================================================
+# Reproyección sobre arreglos de coordenadas
+# =========================================================
+@lru_cache(maxsize=None)
+def transformador(origen, destino):
+    """Transformer de pyproj reutilizable (crearlo cuesta más que usarlo)."""
+    return pyproj.Transformer.from_crs(origen, destino, always_xy=True)
+
+
+def reproyectar(geoms, origen, destino):
+    """Arreglo de geometrías reproyectado en una sola pasada de coordenadas."""
+    t = transformador(pyproj.CRS(origen).srs, pyproj.CRS(destino).srs)
+    return shapely.transform(
+        np.asarray(geoms, dtype=object),
+        lambda xy: np.column_stack(t.transform(xy[:, 0], xy[:, 1])),
+    )
+
+
+# =========================================================
+# Caché de derivados por capa
+# =========================================================
+def _calcular(gdf):
+    metrico = reproyectar(gdf.geometry.values, gdf.crs, CRS_METRICO)
+    # Centroides y puntos representativos viajan juntos de vuelta a grados
+    puntos = reproyectar(
+        np.concatenate([shapely.centroid(metrico), shapely.point_on_surface(metrico)]),
+        CRS_METRICO,
+        CRS_GEOGRAFICO,
+    )
+    n = len(gdf)
+    return Derivadas(
+        gpd.GeoSeries(metrico, index=gdf.index, crs=CRS_METRICO),
+        pd.Series(shapely.area(metrico), index=gdf.index),
+        gpd.GeoSeries(puntos[:n], index=gdf.index, crs=CRS_GEOGRAFICO),
+        gpd.GeoSeries(puntos[n:], index=gdf.index, crs=CRS_GEOGRAFICO),
+    )
+
+
+def derivadas(fuente, gdf):
+    """`Derivadas` de la capa `gdf`, calculadas una vez por proceso bajo `fuente`.
+
+    Para filtrar por subconjunto se indexa con ``.loc[sub.index]``.
+    """
+    with _lock:
+        if fuente not in _cache_derivadas:
+            _cache_derivadas[fuente] = _calcular(gdf)
+        return _cache_derivadas[fuente]
+
+
+def coordenadas_transporte(datos):
+    """(n, 2) lon/lat de estaciones de bus y metro (centroides) y paradas."""
+    return np.vstack(
+        [
+            shapely.get_coordinates(derivadas("buses", datos.buses).centroide.values),
+            shapely.get_coordinates(derivadas("metro", datos.metro).centroide.values),
+            shapely.get_coordinates(datos.paradas.geometry.values),
+        ]
+    )
@@ -0,0 +1,140 @@
+import threading
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from utils.geometrias import CRS_GEOGRAFICO, CRS_METRICO, derivadas, reproyectar
+
+_cache_lados = {}
+_cache_grillas = {}
+_cache_piezas = {}
+_lock = threading.RLock()
+
+
+def celdas_grilla(minx, miny, maxx, maxy, lado):
+    """Celdas cuadradas de `lado` que cubren el rectángulo, como arreglo."""
+    xs = np.arange(minx, maxx, lado)
+    ys = np.arange(miny, maxy, lado)
+    x0, y0 = np.meshgrid(xs, ys, indexing="ij")
+    x0, y0 = x0.ravel(), y0.ravel()
+    return shapely.box(x0, y0, x0 + lado, y0 + lado)
+
+
+def _metrico(fuente, gdf, crs):
+    """Geometría de `gdf` en `crs`, del caché de derivados si es CRS_METRICO."""
+    if crs == CRS_METRICO:
+        return derivadas(fuente, gdf).metrico
+    return gdf.to_crs(crs).geometry
+
+
+def lado_mediana(fuente, gdf, crs=CRS_METRICO):
+    """Lado de celda = raíz de la mediana del área de los polígonos."""
+    clave = (fuente, crs)
+    with _lock:
+        if clave not in _cache_lados:
+            areas = _metrico(fuente, gdf, crs).area
+            _cache_lados[clave] = float(areas.median() ** 0.5)
+        return _cache_lados[clave]
+
+
+def obtener_grilla(fuente, gdf, lado=None, crs=CRS_METRICO):
+    """Grilla dispersa sobre `gdf` en EPSG:4326, cacheada por proceso.
+
+    Solo conserva las celdas que tocan algún polígono de la capa. Si no se
+    indica `lado` se usa la regla de la mediana del área. El resultado es
+    compartido: hay que copiarlo antes de agregarle columnas.
+    """
+    if lado is None:
+        lado = lado_mediana(fuente, gdf, crs)
+    clave = (fuente, lado, crs)
+    with _lock:
+        if clave not in _cache_grillas:
+            geoms_m = _metrico(fuente, gdf, crs).values
+            celdas = celdas_grilla(*shapely.total_bounds(geoms_m), lado)
+
+            # Solo celdas que intersectan algún polígono de la capa
+            arbol = shapely.STRtree(geoms_m)
+            idx_celdas, _ = arbol.query(celdas, predicate="intersects")
+            celdas = celdas[np.unique(idx_celdas)]
+
+            _cache_grillas[clave] = gpd.GeoDataFrame(
+                geometry=reproyectar(celdas, crs, CRS_GEOGRAFICO), crs=CRS_GEOGRAFICO
+            )
+        return _cache_grillas[clave]
+
+
+def instalar_grilla(fuente, lado, grilla, crs=CRS_METRICO):
+    """Registra una grilla ya calculada (p. ej. leída de artefactos/)."""
+    with _lock:
+        _cache_lados[(fuente, crs)] = lado
+        _cache_grillas[(fuente, lado, crs)] = grilla
+
+
+def instalar_piezas(fuente, piezas):
+    """Registra las piezas celda × capa ya calculadas de `fuente`."""
+    with _lock:
+        _cache_piezas[fuente] = piezas
+
+
+def recortar(celdas, gdf, columnas):
+    """Piezas celda × polígono de `gdf` (EPSG:4326), sin `gpd.overlay`.
+
+    Un STRtree empareja cada celda con los polígonos que toca; las
+    intersecciones se calculan en bloque y se separan en polígonos simples.
+    Devuelve las piezas con las `columnas` del polígono y la celda de origen.
+    """
+    geoms = gdf.geometry.values
+    idx_geoms, idx_celdas = shapely.STRtree(celdas).query(geoms, predicate="intersects")
+    piezas = shapely.intersection(celdas[idx_celdas], geoms[idx_geoms])
+
+    # Como overlay + explode: solo las partes poligonales, una fila por parte
+    partes, idx_partes = shapely.get_parts(piezas, return_index=True)
+    poligonos = shapely.get_type_id(partes) == shapely.GeometryType.POLYGON
+    partes, idx_partes = partes[poligonos], idx_partes[poligonos]
+
+    resultado = gdf.iloc[idx_geoms[idx_partes]][columnas].reset_index(drop=True)
+    resultado["celda"] = idx_celdas[idx_partes]
+    return gpd.GeoDataFrame(resultado, geometry=partes, crs=gdf.crs)
+
+
+def piezas_alimentadores(gdf_alimentadores):
+    """Piezas celda × alimentador con su punto representativo (`centroide`)."""
+    with _lock:
+        if "alimentadores" not in _cache_piezas:
+            gdf_grilla = obtener_grilla("alimentadores", gdf_alimentadores)
+            piezas = recortar(
+                gdf_grilla.geometry.values, gdf_alimentadores, ["alimentadorid"]
+            )
+
+            # Una sola reproyección para área y punto representativo
+            piezas_m = reproyectar(piezas.geometry.values, piezas.crs, CRS_METRICO)
+            piezas["area_m2"] = shapely.area(piezas_m)
+            puntos = reproyectar(
+                shapely.point_on_surface(piezas_m), CRS_METRICO, CRS_GEOGRAFICO
+            )
+            piezas["centroide"] = gpd.GeoSeries(puntos, index=piezas.index, crs=CRS_GEOGRAFICO)
+
+            # Sin astillas (< 25 m²) y con el punto dentro de la pieza en grados
+            validas = (piezas["area_m2"].to_numpy() > 25) & shapely.contains(
+                piezas.geometry.values, puntos
+            )
+            _cache_piezas["alimentadores"] = piezas[validas].drop(columns="celda")
+        return _cache_piezas["alimentadores"]
+
+
+def piezas_parroquias(gdf_parroquias):
+    """Piezas celda × parroquia con su centroide (`centroide`)."""
+    with _lock:
+        if "parroquias" not in _cache_piezas:
+            gdf_grilla = obtener_grilla("parroquias", gdf_parroquias)
+            piezas = recortar(gdf_grilla.geometry.values, gdf_parroquias, ["nombre"])
+
+            piezas_m = reproyectar(piezas.geometry.values, piezas.crs, CRS_METRICO)
+            piezas["centroide"] = gpd.GeoSeries(
+                reproyectar(shapely.centroid(piezas_m), CRS_METRICO, CRS_GEOGRAFICO),
+                index=piezas.index,
+                crs=CRS_GEOGRAFICO,
+            )
+            _cache_piezas["parroquias"] = piezas.drop(columns="celda")
+        return _cache_piezas["parroquias"]
@@ -0,0 +1,151 @@
+import threading
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from branca.colormap import linear
+
+from utils.geometrias import CRS_GEOGRAFICO, CRS_METRICO, reproyectar, transformador
+
+RAIZ3 = np.sqrt(3.0)
+
+# Ids: q en los 32 bits altos y r (desplazado a positivo) en los bajos
+_DESPLAZAMIENTO = 2**31
+
+_cache_hexagonos = {}
+_lock = threading.Lock()
+
+
+# =========================================================
+# Coordenadas axiales (hexágonos "pointy-top" en EPSG:32717)
+# =========================================================
+def _redondear(qf, rf):
+    """Redondeo cúbico: hexágono axial (q, r) que contiene el punto fraccionario."""
+    sf = -qf - rf
+    q, r, s = np.rint(qf), np.rint(rf), np.rint(sf)
+    dq, dr, ds = np.abs(q - qf), np.abs(r - rf), np.abs(s - sf)
+    corregir_q = (dq > dr) & (dq > ds)
+    corregir_r = ~corregir_q & (dr > ds)
+    q = np.where(corregir_q, -r - s, q)
+    r = np.where(corregir_r, -q - s, r)
+    return q.astype(np.int64), r.astype(np.int64)
+
+
+def axiales(x, y, lado):
+    """(q, r) del hexágono de `lado` metros que contiene cada punto métrico."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    return _redondear((RAIZ3 / 3 * x - y / 3) / lado, (2 / 3 * y) / lado)
+
+
+def codificar(q, r):
+    return (q << 32) | (r + _DESPLAZAMIENTO)
+
+
+def decodificar(ids):
+    ids = np.asarray(ids, dtype=np.int64)
+    return ids >> 32, (ids & 0xFFFFFFFF) - _DESPLAZAMIENTO
+
+
+def centros(q, r, lado):
+    return lado * (RAIZ3 * q + RAIZ3 / 2 * r), lado * 1.5 * r
+
+
+def contar(lon, lat, lado, limites=None):
+    """(ids, conteos) de los hexágonos con al menos un punto.
+
+    Se descartan coordenadas no finitas y, si se dan `limites` (oeste, sur,
+    este, norte en grados), las que caen fuera: un punto atípico no debe
+    agrandar nada. El conteo es disperso (`np.unique` sobre los ids), así
+    que la memoria depende de los hexágonos ocupados, no de su rectángulo.
+    """
+    lon = np.asarray(lon, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    validos = np.isfinite(lon) & np.isfinite(lat)
+    if limites is not None:
+        oeste, sur, este, norte = limites
+        validos &= (lon >= oeste) & (lon <= este) & (lat >= sur) & (lat <= norte)
+    if not validos.any():
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    x, y = transformador(CRS_GEOGRAFICO, CRS_METRICO).transform(lon[validos], lat[validos])
+    ids, conteos = np.unique(codificar(*axiales(x, y, lado)), return_counts=True)
+    return ids, conteos.astype(np.int64)
+
+
+# =========================================================
+# Geometría
+# =========================================================
+def poligonos(ids, lado):
+    """Hexágonos de los `ids` en EPSG:4326, construidos en bloque."""
+    q, r = decodificar(ids)
+    cx, cy = centros(q, r, lado)
+    angulos = np.radians(30 + 60 * np.arange(7))  # 7: el anillo se cierra
+    xs = cx[:, None] + lado * np.cos(angulos)[None, :]
+    ys = cy[:, None] + lado * np.sin(angulos)[None, :]
+    anillos = np.stack([xs, ys], axis=-1)
+    return reproyectar(shapely.polygons(anillos), CRS_METRICO, CRS_GEOGRAFICO)
+
+
+def hexagonos(fuente, gdf, lado):
+    """Hexágonos de `lado` que tocan la capa `gdf`, cacheados por resolución.
+
+    GeoDataFrame (EPSG:4326) con la columna `hex_id`, ordenado por id, para
+    ubicar conteos con `searchsorted`. Compartido: copiar antes de modificar.
+    """
+    clave = (fuente, lado)
+    with _lock:
+        if clave not in _cache_hexagonos:
+            minx, miny, maxx, maxy = shapely.total_bounds(
+                reproyectar(gdf.geometry.values, gdf.crs, CRS_METRICO)
+            )
+            # Centros candidatos: todo (q, r) cuyo hexágono puede tocar el rectángulo
+            q_esq, r_esq = axiales([minx, maxx, minx, maxx], [miny, miny, maxy, maxy], lado)
+            qs = np.arange(q_esq.min() - 1, q_esq.max() + 2)
+            rs = np.arange(r_esq.min() - 1, r_esq.max() + 2)
+            q, r = (a.ravel() for a in np.meshgrid(qs, rs, indexing="ij"))
+            ids = codificar(q, r)
+
+            geoms = poligonos(ids, lado)
+            idx, _ = shapely.STRtree(gdf.geometry.values).query(geoms, predicate="intersects")
+            dentro = np.unique(idx)
+            _cache_hexagonos[clave] = gpd.GeoDataFrame(
+                {"hex_id": ids[dentro]}, geometry=geoms[dentro], crs=CRS_GEOGRAFICO
+            ).sort_values("hex_id", ignore_index=True)
+        return _cache_hexagonos[clave]
+
+
+def conteo_hexagonos(fuente, gdf, lon, lat, lado):
+    """Puntos por hexágono de la malla de `gdf`, alineado con `hexagonos(...)`."""
+    malla = hexagonos(fuente, gdf, lado)
+    ids, conteos = contar(lon, lat, lado, tuple(gdf.total_bounds))
+    ids_malla = malla["hex_id"].to_numpy()
+    pos = np.searchsorted(ids_malla, ids)
+    validos = (pos < len(ids_malla)) & (ids_malla[np.minimum(pos, len(ids_malla) - 1)] == ids)
+    resultado = np.zeros(len(ids_malla), dtype=np.int64)
+    resultado[pos[validos]] = conteos[validos]
+    return resultado
+
+
+# =========================================================
+# Capa de densidad hexagonal (para capas diferidas)
+# =========================================================
+# Lado (= radio) en metros del hexágono de las capas de las páginas
+LADO_CAPAS = 500
+
+
+def capa_hexagonos(datos, lon, lat, lado=LADO_CAPAS, etiqueta="Total puntos"):
+    """Hexágonos con puntos sobre las parroquias, con `color` y `tooltip`."""
+    malla = hexagonos("parroquias", datos.parroquias, lado)
+    conteo = conteo_hexagonos("parroquias", datos.parroquias, lon, lat, lado)
+    con_puntos = conteo > 0
+    conteo = conteo[con_puntos]
+
+    colormap = linear.YlOrRd_09.scale(0, max(int(conteo.max(initial=0)), 1))
+    return gpd.GeoDataFrame(
+        {
+            "color": [colormap(c) for c in conteo],
+            "tooltip": [f"<b>{etiqueta}:</b> {c}" for c in conteo],
+        },
+        geometry=malla.geometry.values[con_puntos],
+        crs=CRS_GEOGRAFICO,
+    )
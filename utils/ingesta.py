@@ -0,0 +1,160 @@
+import hashlib
+import inspect
+import json
+import os
+import threading
+
+import pandas as pd
+import pyarrow.feather as feather
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, "..", "cache")
+MANIFIESTO_PATH = os.path.join(CACHE_DIR, "manifiesto.json")
+
+# Subir al cambiar cómo se escribe la caché (p. ej. opciones de Feather)
+FORMATO = 1
+
+_lock = threading.Lock()
+
+
+# =========================================================
+# Lectura y limpieza de cada fuente (se ejecuta solo al reconstruir)
+# =========================================================
+def leer_estudiantes(ruta):
+    df = pd.read_csv(ruta, sep=";").rename(columns={"Semestre": "periodo"})
+    df["periodo"] = df["periodo"].astype(str)
+    df["Latitud"] = pd.to_numeric(df["Latitud"], errors="coerce")
+    df["Longitud"] = pd.to_numeric(df["Longitud"], errors="coerce")
+    return df.dropna(subset=["Latitud", "Longitud"])
+
+
+def leer_universidades(ruta):
+    df = pd.read_excel(ruta, sheet_name="Universidades").rename(
+        columns=lambda c: c.strip()
+    )
+    df["UNIVERSIDAD"] = df["UNIVERSIDAD"].str.strip()
+    df["LATITUD"] = pd.to_numeric(df["LATITUD"], errors="coerce")
+    df["LONGITUD"] = pd.to_numeric(df["LONGITUD"], errors="coerce")
+    return df
+
+
+def leer_colegios(ruta):
+    df = pd.read_excel(ruta, sheet_name="Colegios").rename(columns=lambda c: c.strip())
+    df["COLEGIO"] = df["COLEGIO"].str.strip()
+    df["LATITUD"] = pd.to_numeric(df["LATITUD"], errors="coerce")
+    df["LONGITUD"] = pd.to_numeric(df["LONGITUD"], errors="coerce")
+    return df.dropna(subset=["LATITUD", "LONGITUD"])
+
+
+def leer_carreras(ruta):
+    df = pd.read_excel(ruta)
+    df["PERIODO"] = df["PERIODO"].astype(str)
+    for col in ["UNIVERSIDAD", "NIVEL", "FACULTAD", "CARRERA"]:
+        df[col] = df[col].str.strip()
+    return df
+
+
+def leer_empresas(ruta):
+    df = pd.read_excel(ruta).rename(columns=lambda c: c.strip())
+    coords = df["COORDENADAS"].astype(str).str.split(",", expand=True)
+    df["LATITUD"] = pd.to_numeric(coords[0], errors="coerce")
+    df["LONGITUD"] = pd.to_numeric(coords[1], errors="coerce")
+    return df.dropna(subset=["LATITUD", "LONGITUD"])
+
+
+def leer_poblacion(ruta):
+    df = pd.read_excel(ruta)
+    df["Poblacion"] = df["Poblacion"].astype(str).str.replace(",", "").astype(float)
+    df["Parroquia"] = df["Parroquia"].str.strip().str.upper()
+    return df
+
+
+LECTORES = {
+    "estudiantes": leer_estudiantes,
+    "universidades": leer_universidades,
+    "colegios": leer_colegios,
+    "carreras": leer_carreras,
+    "empresas": leer_empresas,
+    "poblacion": leer_poblacion,
+}
+
+
+# =========================================================
+# Caché columnar (Feather sin compresión)
+# =========================================================
+def version_lector(nombre):
+    """Huella del formato y del código de `LECTORES[nombre]`: si cambia la
+    limpieza de una fuente, su caché se reconstruye aunque el archivo no."""
+    fuente = f"{FORMATO}\n{inspect.getsource(LECTORES[nombre])}"
+    return hashlib.sha256(fuente.encode("utf-8")).hexdigest()[:16]
+
+
+def hash_archivo(ruta):
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _leer_manifiesto():
+    try:
+        with open(MANIFIESTO_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _escribir_atomico(ruta, escribir):
+    tmp = f"{ruta}.{os.getpid()}.tmp"
+    escribir(tmp)
+    os.replace(tmp, ruta)
+
+
+def _guardar_manifiesto(manifiesto):
+    def escribir(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifiesto, f, indent=2, sort_keys=True)
+
+    _escribir_atomico(MANIFIESTO_PATH, escribir)
+
+
+def cargar_tabla(nombre, ruta_fuente):
+    """Devuelve la tabla limpia de `nombre`, reconstruyendo su caché si la
+    fuente cambió (primero por mtime/tamaño, luego por hash del contenido)
+    o si cambió su lector.
+
+    La tabla se convierte a pandas entera: no queda mapeada en memoria.
+    """
+    destino = os.path.join(CACHE_DIR, f"{nombre}.feather")
+    stat = os.stat(ruta_fuente)
+    lector = version_lector(nombre)
+
+    with _lock:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        manifiesto = _leer_manifiesto()
+        entrada = manifiesto.get(nombre, {})
+        if entrada.get("lector") != lector:
+            entrada = {}  # otro lector: lo guardado no sirve
+        vigente = os.path.exists(destino) and (
+            entrada.get("mtime") == stat.st_mtime and entrada.get("size") == stat.st_size
+        )
+
+        if not vigente:
+            sha = hash_archivo(ruta_fuente)
+            if not (os.path.exists(destino) and entrada.get("sha256") == sha):
+                df = LECTORES[nombre](ruta_fuente).reset_index(drop=True)
+                _escribir_atomico(
+                    destino,
+                    lambda tmp: feather.write_feather(df, tmp, compression="uncompressed"),
+                )
+            manifiesto[nombre] = {
+                "fuente": os.path.basename(ruta_fuente),
+                "mtime": stat.st_mtime,
+                "size": stat.st_size,
+                "sha256": sha,
+                "lector": lector,
+            }
+            _guardar_manifiesto(manifiesto)
+
+    return feather.read_table(destino).to_pandas()
@@ -0,0 +1,113 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+
+# Funciones que muestra el reporte de ?_profile=1
+LINEAS_REPORTE = 60
+
+# cProfile no admite dos perfiles activos a la vez en el intérprete (3.12+)
+_lock_perfil = threading.Lock()
+
+
+# =========================================================
+# Etapas de la petición (cabecera Server-Timing)
+# =========================================================
+@contextmanager
+def etapa(nombre):
+    """Mide un bloque y lo suma a la etapa `nombre` de la petición actual.
+
+    Fuera de una petición (p. ej. en `flask build-cache`) no hace nada.
+    """
+    if not has_request_context() or "etapas" not in g:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        g.etapas[nombre] = g.etapas.get(nombre, 0.0) + time.perf_counter() - inicio
+
+
+def marcar(nombre, descripcion):
+    """Agrega a Server-Timing una métrica sin duración (p. ej. cache=hit)."""
+    if has_request_context() and "etapas" in g:
+        g.descripciones[nombre] = descripcion
+
+
+def server_timing(etapas, descripciones, total):
+    """Valor de la cabecera: `etapa;dur=ms, ..., total;dur=ms` (RFC Server-Timing)."""
+    partes = [f"{nombre};dur={seg * 1000:.1f}" for nombre, seg in etapas.items()]
+    partes += [f'{nombre};desc="{desc}"' for nombre, desc in descripciones.items()]
+    partes.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(partes)
+
+
+# =========================================================
+# Perfil bajo demanda (?_profile=1)
+# =========================================================
+def perfilando():
+    """True si esta petición se está perfilando (las vistas no usan caché)."""
+    return has_request_context() and g.get("perfil") is not None
+
+
+def _reporte(perfil):
+    salida = io.StringIO()
+    stats = pstats.Stats(perfil, stream=salida)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(LINEAS_REPORTE)
+    return salida.getvalue()
+
+
+def init_app(app):
+    # Nunca activo por defecto: el reporte expone rutas y nombres internos
+    app.config.setdefault("PERFIL_PERMITIDO", os.environ.get("PERFIL_PERMITIDO") == "1")
+    app.config.setdefault("SERVER_TIMING", True)
+
+    @app.before_request
+    def iniciar():
+        g.inicio = time.perf_counter()
+        g.etapas = {}
+        g.descripciones = {}
+        g.perfil = None
+        if (
+            request.args.get("_profile") == "1"
+            and current_app.config["PERFIL_PERMITIDO"]
+            and _lock_perfil.acquire(blocking=False)
+        ):
+            g.perfil = cProfile.Profile()
+            g.perfil.enable()
+
+    @app.after_request
+    def terminar(resp):
+        if "inicio" not in g:
+            return resp
+        total = time.perf_counter() - g.inicio
+
+        if g.perfil is not None:
+            g.perfil.disable()
+            _lock_perfil.release()
+            reporte = _reporte(g.perfil)
+            g.perfil = None
+            encabezado = server_timing(g.etapas, g.descripciones, total).replace(", ", "\n")
+            resp = current_app.response_class(
+                f"{request.full_path}\n\n{encabezado}\n\n{reporte}",
+                mimetype="text/plain",
+            )
+            resp.headers["Cache-Control"] = "no-store"
+
+        if current_app.config["SERVER_TIMING"]:
+            resp.headers["Server-Timing"] = server_timing(g.etapas, g.descripciones, total)
+        return resp
+
+    @app.teardown_request
+    def liberar(exc):
+        # Si la vista falló, after_request no corre: se suelta el perfil aquí
+        perfil = g.pop("perfil", None)
+        if perfil is not None:
+            perfil.disable()
+            _lock_perfil.release()
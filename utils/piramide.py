@@ -0,0 +1,87 @@
+import threading
+
+import numpy as np
+import shapely
+
+# Tolerancias de simplificación en grados, de más a menos detalle
+TOLERANCIAS = (0.0001, 0.0005, 0.002)
+
+# Zoom con que las páginas piden sus capas (`por_zoom`): solo su nivel se
+# precalcula; los demás se simplifican si alguien los pide
+ZOOM_PAGINAS = 11
+
+_cache_coberturas = {}
+_cache_niveles = {}
+_lock = threading.RLock()
+
+
+def cobertura(geometrias):
+    """Polígonos re-noded para que vecinos compartan exactamente sus bordes.
+
+    Los bordes de todas las geometrías se unen (quedan noded) y se
+    poligonizan; cada cara vuelve al polígono original que la contiene. Así
+    desaparecen los solapes mínimos y los vértices no coincidentes que
+    impiden simplificar la capa como cobertura.
+    """
+    geometrias = np.asarray(geometrias, dtype=object)
+    if shapely.coverage_is_valid(geometrias):
+        return geometrias
+
+    lineas = shapely.union_all(shapely.boundary(geometrias))
+    caras = shapely.get_parts(shapely.polygonize(shapely.get_parts(lineas)))
+    idx_caras, idx_geoms = shapely.STRtree(geometrias).query(
+        shapely.point_on_surface(caras), predicate="within"
+    )
+    # Una cara dentro de dos polígonos (solape) queda en el de menor índice
+    idx_caras, primero = np.unique(idx_caras, return_index=True)
+    dueno = np.full(len(caras), -1)
+    dueno[idx_caras] = idx_geoms[primero]
+
+    resultado = geometrias.copy()
+    for i in np.unique(dueno[dueno >= 0]):
+        resultado[i] = shapely.union_all(caras[dueno == i])
+    return resultado
+
+
+def geometrias_nivel(fuente, gdf, tolerancia):
+    """Geometrías de `gdf` (EPSG:4326) simplificadas como cobertura.
+
+    La simplificación trata los bordes compartidos una sola vez, así que las
+    parroquias vecinas siguen sin huecos ni solapes. Cacheado por proceso.
+    """
+    clave = (fuente, tolerancia)
+    with _lock:
+        if clave not in _cache_niveles:
+            if fuente not in _cache_coberturas:
+                _cache_coberturas[fuente] = cobertura(gdf.geometry.values)
+            _cache_niveles[clave] = shapely.coverage_simplify(
+                _cache_coberturas[fuente], tolerancia
+            )
+        return _cache_niveles[clave]
+
+
+def instalar_nivel(fuente, tolerancia, geometrias):
+    """Registra un nivel ya simplificado (p. ej. leído de artefactos/)."""
+    with _lock:
+        _cache_niveles[(fuente, tolerancia)] = geometrias
+
+
+def tolerancia_para_zoom(zoom):
+    """Mayor tolerancia que no supera un píxel a ese zoom (None: sin simplificar)."""
+    pixel = 360.0 / (256 * 2**zoom)
+    aptas = [t for t in TOLERANCIAS if t <= pixel]
+    return max(aptas) if aptas else None
+
+
+def tolerancias_usadas():
+    """Niveles que piden las páginas, los que construyen precalentar y build-cache."""
+    tolerancia = tolerancia_para_zoom(ZOOM_PAGINAS)
+    return () if tolerancia is None else (tolerancia,)
+
+
+def por_zoom(fuente, gdf, zoom):
+    """Copia de `gdf` con la geometría del nivel de la pirámide para `zoom`."""
+    tolerancia = tolerancia_para_zoom(zoom)
+    if tolerancia is None:
+        return gdf
+    return gdf.set_geometry(geometrias_nivel(fuente, gdf, tolerancia), crs=gdf.crs)
@@ -0,0 +1,48 @@
+import time
+
+from utils.agregados import tabla_estudiantes
+from utils.datos import obtener_datos
+from utils.geometrias import derivadas
+from utils.piramide import geometrias_nivel, tolerancias_usadas
+from utils.teselas import CAPAS, obtener_indice
+
+# Capas cuyos centroides/áreas usan las páginas
+CAPAS_DERIVADAS = ("buses", "metro", "parques", "plazas", "centros_comerciales")
+
+# Páginas que se renderizan al arrancar (con el periodo por defecto)
+PAGINAS = [
+    "/",
+    "/mapacalor/estudiantes",
+    "/mapacalor/universidades",
+    "/mapacalor/colegios",
+    "/mapacalor/empresas",
+    "/api/estudiantes/conteos",
+]
+
+
+def precalentar(app, paginas=PAGINAS, log=print):
+    """Construye una vez los artefactos pesados y llena el caché de páginas.
+
+    Pensado para el proceso maestro de gunicorn (``preload_app``): lo que se
+    calcula aquí lo heredan todos los workers al hacer fork.
+    """
+    inicio = time.perf_counter()
+    with app.app_context():
+        datos = obtener_datos()
+        tabla_estudiantes(datos)
+        for fuente in CAPAS_DERIVADAS:
+            derivadas(fuente, getattr(datos, fuente))
+        for tolerancia in tolerancias_usadas():
+            geometrias_nivel("parroquias", datos.parroquias, tolerancia)
+            geometrias_nivel("alimentadores", datos.alimentadores, tolerancia)
+        # Grillas, piezas y centroides se construyen junto con sus índices
+        for capa in CAPAS:
+            obtener_indice(capa)
+
+    cliente = app.test_client()
+    for url in paginas:
+        t = time.perf_counter()
+        resp = cliente.get(url)
+        log(f"precalentar {url}: {resp.status_code} en {time.perf_counter() - t:.2f}s")
+
+    log(f"precalentar: listo en {time.perf_counter() - inicio:.2f}s")
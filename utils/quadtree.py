@@ -0,0 +1,121 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from utils.geometrias import CRS_GEOGRAFICO, CRS_METRICO, derivadas, reproyectar, transformador
+
+# Una celda se divide mientras tenga más puntos que esto y no llegue al mínimo
+UMBRAL_PUNTOS = 25
+LADO_MINIMO_M = 250
+# Celdas más grandes que esto se dividen aunque estén vacías
+LADO_MAXIMO_M = 8000
+
+# Morton de 2 × 16 bits: hasta 65 536 celdas por eje en el nivel más fino
+NIVELES_MAXIMOS = 16
+
+
+# =========================================================
+# Códigos Morton (Z-order)
+# =========================================================
+def _expandir(v):
+    """Intercala un cero entre cada bit de `v` (16 bits → 32 bits)."""
+    v = v.astype(np.int64) & 0xFFFF
+    v = (v | (v << 8)) & 0x00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F
+    v = (v | (v << 2)) & 0x33333333
+    return (v | (v << 1)) & 0x55555555
+
+
+def _compactar(v):
+    """Inversa de `_expandir`: toma los bits pares."""
+    v = v & 0x55555555
+    v = (v | (v >> 1)) & 0x33333333
+    v = (v | (v >> 2)) & 0x0F0F0F0F
+    v = (v | (v >> 4)) & 0x00FF00FF
+    return (v | (v >> 8)) & 0xFFFF
+
+
+def morton(ix, iy):
+    return _expandir(ix) | (_expandir(iy) << 1)
+
+
+def desde_morton(codigos):
+    codigos = np.asarray(codigos, dtype=np.int64)
+    return _compactar(codigos), _compactar(codigos >> 1)
+
+
+# =========================================================
+# Árbol adaptativo
+# =========================================================
+def _raiz(limites):
+    """Cuadrado que cubre `limites` (métricos) y su profundidad máxima."""
+    minx, miny, maxx, maxy = limites
+    lado = max(maxx - minx, maxy - miny, LADO_MINIMO_M)
+    profundidad = min(int(np.ceil(np.log2(lado / LADO_MINIMO_M))), NIVELES_MAXIMOS)
+    return (minx, miny), lado, profundidad
+
+
+def hojas(x, y, limites, umbral=UMBRAL_PUNTOS):
+    """Hojas del quadtree de los puntos métricos (x, y): (nivel, prefijo, conteo).
+
+    Los puntos se ordenan una vez por código Morton; en cada nivel el conteo
+    de todas las celdas sale de dos `searchsorted`, porque los puntos de una
+    celda ocupan un rango contiguo de códigos.
+    """
+    (x0, y0), lado, profundidad = _raiz(limites)
+    n = 2**profundidad
+    ix = np.floor((np.asarray(x) - x0) / lado * n).astype(np.int64)
+    iy = np.floor((np.asarray(y) - y0) / lado * n).astype(np.int64)
+    dentro = (ix >= 0) & (ix < n) & (iy >= 0) & (iy < n)
+    codigos = np.sort(morton(ix[dentro], iy[dentro]))
+
+    nivel_inicial = min(max(int(np.ceil(np.log2(lado / LADO_MAXIMO_M))), 0), profundidad)
+    prefijos = np.arange(4**nivel_inicial, dtype=np.int64)
+    niveles, resultado, conteos = [], [], []
+    for nivel in range(nivel_inicial, profundidad + 1):
+        corrimiento = 2 * (profundidad - nivel)
+        conteo = np.searchsorted(codigos, (prefijos + 1) << corrimiento) - np.searchsorted(
+            codigos, prefijos << corrimiento
+        )
+        dividir = (conteo > umbral) & (nivel < profundidad)
+        niveles.append(np.full((~dividir).sum(), nivel))
+        resultado.append(prefijos[~dividir])
+        conteos.append(conteo[~dividir])
+        prefijos = (prefijos[dividir][:, None] * 4 + np.arange(4)).ravel()
+        if len(prefijos) == 0:
+            break
+    return np.concatenate(niveles), np.concatenate(resultado), np.concatenate(conteos)
+
+
+def celdas(niveles, prefijos, limites):
+    """Cuadrados métricos de cada hoja."""
+    (x0, y0), lado, _ = _raiz(limites)
+    ix, iy = desde_morton(prefijos)
+    tam = lado / 2.0**niveles
+    return shapely.box(x0 + ix * tam, y0 + iy * tam, x0 + (ix + 1) * tam, y0 + (iy + 1) * tam)
+
+
+def grilla_adaptativa(fuente, gdf, lon, lat, umbral=UMBRAL_PUNTOS):
+    """Grilla quadtree sobre `gdf` (EPSG:4326) con `count` y `densidad` (por km²).
+
+    Las celdas se dividen donde hay puntos y quedan grandes donde no; solo se
+    devuelven las que tocan algún polígono de la capa.
+    """
+    metrico = derivadas(fuente, gdf).metrico.values
+    limites = shapely.total_bounds(metrico)
+    x, y = transformador(CRS_GEOGRAFICO, CRS_METRICO).transform(lon, lat)
+    niveles, prefijos, conteos = hojas(x, y, limites, umbral)
+    cuadros = celdas(niveles, prefijos, limites)
+
+    idx, _ = shapely.STRtree(metrico).query(cuadros, predicate="intersects")
+    tocan = np.unique(idx)
+    cuadros, conteos, niveles = cuadros[tocan], conteos[tocan], niveles[tocan]
+    return gpd.GeoDataFrame(
+        {
+            "count": conteos,
+            "densidad": np.round(conteos / (shapely.area(cuadros) / 1e6), 1),
+            "nivel": niveles,
+        },
+        geometry=reproyectar(cuadros, CRS_METRICO, CRS_GEOGRAFICO),
+        crs=CRS_GEOGRAFICO,
+    )
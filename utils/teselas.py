@@ -0,0 +1,139 @@
+import json
+import math
+import threading
+
+import numpy as np
+import shapely
+from flask import current_app, request
+
+from utils.cache_paginas import CacheLRU
+from utils.datos import obtener_datos
+from utils.grilla import obtener_grilla, piezas_alimentadores, piezas_parroquias
+
+# Por debajo de este zoom se simplifican las geometrías al tamaño de un píxel
+ZOOM_SIN_SIMPLIFICAR = 15
+
+
+# =========================================================
+# Capas servidas por teselas: GeoDataFrame en EPSG:4326 con `tooltip`
+# =========================================================
+def _capa_paradas(datos):
+    return datos.paradas[["geometry"]].assign(tooltip="Parada de Bus")
+
+
+def _capa_grilla(datos):
+    return obtener_grilla("parroquias", datos.parroquias)[["geometry"]]
+
+
+def _capa_grilla_alimentadores(datos):
+    return obtener_grilla("alimentadores", datos.alimentadores)[["geometry"]]
+
+
+def _capa_centroides(datos):
+    piezas = piezas_parroquias(datos.parroquias)
+    return piezas[["centroide"]].set_geometry("centroide").assign(
+        tooltip="Centroide intersección"
+    )
+
+
+def _capa_centroides_alimentadores(datos):
+    piezas = piezas_alimentadores(datos.alimentadores)
+    nombres = piezas["alimentadorid"].map(
+        lambda aid: datos.alimentador_nombres.get(aid, aid)
+    )
+    return piezas[["centroide"]].set_geometry("centroide").assign(
+        tooltip="Centroide " + nombres
+    )
+
+
+CAPAS = {
+    "paradas": _capa_paradas,
+    "grilla": _capa_grilla,
+    "grilla_alimentadores": _capa_grilla_alimentadores,
+    "centroides": _capa_centroides,
+    "centroides_alimentadores": _capa_centroides_alimentadores,
+}
+
+
+# =========================================================
+# Índice espacial por capa
+# =========================================================
+def limites_tesela(z, x, y):
+    """(minx, miny, maxx, maxy) en grados de la tesela XYZ."""
+    n = 2.0**z
+    lon_min = x / n * 360.0 - 180.0
+    lon_max = (x + 1) / n * 360.0 - 180.0
+    lat_max = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    lat_min = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return lon_min, lat_min, lon_max, lat_max
+
+
+class IndiceTeselas:
+    """STRtree sobre una capa y geometrías simplificadas por nivel de zoom."""
+
+    def __init__(self, gdf):
+        gdf = gdf.reset_index(drop=True)
+        self.geoms = np.asarray(gdf.geometry.values)
+        self.arbol = shapely.STRtree(self.geoms)
+        columnas = [c for c in gdf.columns if c != gdf.geometry.name]
+        if columnas:
+            self.propiedades = [
+                json.dumps(p, ensure_ascii=False)
+                for p in gdf[columnas].to_dict(orient="records")
+            ]
+        else:
+            self.propiedades = ["{}"] * len(gdf)
+        self._simplificadas = {}
+        self._lock = threading.Lock()
+
+    def geometrias(self, z):
+        if z >= ZOOM_SIN_SIMPLIFICAR:
+            return self.geoms
+        with self._lock:
+            if z not in self._simplificadas:
+                tolerancia = 360.0 / (256 * 2**z)  # grados por píxel
+                self._simplificadas[z] = shapely.simplify(
+                    self.geoms, tolerancia, preserve_topology=True
+                )
+            return self._simplificadas[z]
+
+    def tesela(self, z, x, y):
+        """FeatureCollection (texto JSON) con los features que tocan la tesela.
+
+        Los features no se cortan en el borde: el cliente los deduplica por
+        `id`, así no aparecen costuras entre teselas vecinas.
+        """
+        idx = self.arbol.query(shapely.box(*limites_tesela(z, x, y)))
+        idx.sort()
+        geojson = shapely.to_geojson(self.geometrias(z)[idx])
+        features = ",".join(
+            f'{{"type":"Feature","id":{i},"geometry":{g},"properties":{self.propiedades[i]}}}'
+            for i, g in zip(idx.tolist(), geojson)
+        )
+        return f'{{"type":"FeatureCollection","features":[{features}]}}'
+
+
+def init_app(app):
+    app.config.setdefault("CACHE_TESELAS_MAX_BYTES", 64 * 1024 * 1024)
+    app.config.setdefault("CACHE_TESELAS_CONTROL", "public, max-age=86400")
+    app.extensions["teselas"] = {
+        "cache": CacheLRU(app.config["CACHE_TESELAS_MAX_BYTES"]),
+        "indices": {},
+        "lock": threading.Lock(),
+    }
+
+
+def obtener_indice(capa):
+    estado = current_app.extensions["teselas"]
+    with estado["lock"]:
+        if capa not in estado["indices"]:
+            estado["indices"][capa] = IndiceTeselas(CAPAS[capa](obtener_datos()))
+        return estado["indices"][capa]
+
+
+def url_teselas(capa):
+    """Plantilla de URL para Leaflet; la versión de datos invalida el caché HTTP."""
+    return (
+        f"{request.script_root}/tiles/{capa}/{{z}}/{{x}}/{{y}}"
+        f"?v={obtener_datos().version}"
+    )
@@ -0,0 +1,123 @@
+import numpy as np
+import shapely
+
+# Pasos de la grilla de cuantización por eje (≈1 m sobre el área de Quito)
+CUANTIZACION = 100_000
+
+OBJETO = "capa"
+
+
+def _anillos(geom):
+    """Anillos de cada polígono de `geom`: [[exterior, huecos...], ...]."""
+    poligonos = shapely.get_parts(geom)
+    return [
+        [p.exterior, *p.interiors]
+        for p in poligonos
+        if p.geom_type == "Polygon" and not p.is_empty
+    ]
+
+
+def _sin_repetidos(puntos):
+    """Quita vértices consecutivos iguales (aparecen al cuantizar)."""
+    distinto = np.any(puntos[1:] != puntos[:-1], axis=1)
+    return np.vstack([puntos[:1], puntos[1:][distinto]])
+
+
+def _canonico(arco):
+    """Clave de un arco, igual para sus dos sentidos; y si está invertido."""
+    directo, inverso = tuple(arco), tuple(reversed(arco))
+    return (directo, False) if directo <= inverso else (inverso, True)
+
+
+def topologia(gdf, campos=(), cuantizacion=CUANTIZACION):
+    """TopoJSON (dict) de una capa de polígonos en EPSG:4326.
+
+    Las coordenadas se cuantizan a enteros y cada arco se guarda una sola vez
+    con sus puntos codificados en deltas; dos polígonos vecinos referencian
+    el mismo arco (uno de ellos invertido, ``~i``). Espera bordes compartidos
+    con los mismos vértices, como los de la pirámide de geometrías.
+    """
+    campos = list(dict.fromkeys(campos))
+    geoms = gdf.geometry.values
+    minx, miny, maxx, maxy = shapely.total_bounds(geoms)
+    escala = np.array(
+        [(maxx - minx) / (cuantizacion - 1) or 1, (maxy - miny) / (cuantizacion - 1) or 1]
+    )
+    origen = np.array([minx, miny])
+
+    # 1. Anillos cuantizados (cerrados: el último punto repite el primero)
+    poligonos = []
+    for geom in geoms:
+        anillos_geom = []
+        for anillos in _anillos(geom):
+            cuantizados = []
+            for anillo in anillos:
+                puntos = np.round((shapely.get_coordinates(anillo) - origen) / escala)
+                puntos = _sin_repetidos(puntos.astype(np.int64))
+                if len(puntos) >= 4:
+                    cuantizados.append([tuple(p) for p in puntos.tolist()])
+            if cuantizados:
+                anillos_geom.append(cuantizados)
+        poligonos.append(anillos_geom)
+
+    # 2. Uniones: vértices con más de dos vecinos distintos entre todos los anillos
+    vecinos = {}
+    for anillos_geom in poligonos:
+        for anillos in anillos_geom:
+            for anillo in anillos:
+                for a, b in zip(anillo[:-1], anillo[1:]):
+                    vecinos.setdefault(a, set()).add(b)
+                    vecinos.setdefault(b, set()).add(a)
+    uniones = {p for p, v in vecinos.items() if len(v) > 2}
+
+    # 3. Cortar cada anillo en las uniones y deduplicar los arcos
+    arcos, indice = [], {}
+
+    def id_arco(arco):
+        clave, invertido = _canonico(arco)
+        if clave not in indice:
+            indice[clave] = len(arcos)
+            arcos.append(clave)
+        i = indice[clave]
+        return ~i if invertido else i
+
+    def cortar(anillo):
+        abierto = anillo[:-1]
+        cortes = [k for k, p in enumerate(abierto) if p in uniones]
+        if not cortes:
+            # Anillo sin uniones: se rota a su menor vértice para que dos
+            # anillos idénticos (p. ej. un enclave y su hueco) coincidan
+            k = abierto.index(min(abierto))
+            rotado = abierto[k:] + abierto[:k]
+            return [id_arco(rotado + rotado[:1])]
+        rotado = abierto[cortes[0] :] + abierto[: cortes[0]]
+        cortes = [k - cortes[0] for k in cortes] + [len(rotado)]
+        cerrado = rotado + rotado[:1]
+        return [id_arco(cerrado[a : b + 1]) for a, b in zip(cortes[:-1], cortes[1:])]
+
+    geometrias = []
+    propiedades = gdf[campos].to_dict(orient="records") if campos else [{}] * len(gdf)
+    for anillos_geom, props in zip(poligonos, propiedades):
+        partes = [[cortar(anillo) for anillo in anillos] for anillos in anillos_geom]
+        if not partes:
+            geometria = {"type": None}
+        elif len(partes) == 1:
+            geometria = {"type": "Polygon", "arcs": partes[0]}
+        else:
+            geometria = {"type": "MultiPolygon", "arcs": partes}
+        geometria["properties"] = props
+        geometrias.append(geometria)
+
+    # 4. Arcos en deltas: primer punto absoluto, el resto relativo al anterior
+    arcos_delta = []
+    for arco in arcos:
+        puntos = np.array(arco, dtype=np.int64)
+        puntos[1:] = np.diff(puntos, axis=0)
+        arcos_delta.append(puntos.tolist())
+
+    return {
+        "type": "Topology",
+        "transform": {"scale": escala.tolist(), "translate": origen.tolist()},
+        "objects": {OBJETO: {"type": "GeometryCollection", "geometries": geometrias}},
+        "arcs": arcos_delta,
+    }